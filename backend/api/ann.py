@@ -0,0 +1,206 @@
+import math
+import faiss
+import numpy as np
+
+
+# Approximate nearest-neighbour variants of the MiniLM chunk index.
+#
+#   flat       IndexFlatIP, exact (what ocr_search.build_index writes)
+#   ivf_flat   inverted lists over k-means cells, full vectors
+#   ivf_pq     inverted lists, product-quantized vectors (~1/16 the memory)
+#   hnsw       graph index, full vectors
+#
+# Search breadth is chosen per query (nprobe for IVF, efSearch for HNSW), so
+# one loaded index can serve different recall/latency points.
+#
+# Once books are added or removed incrementally (with_ids), labels are still
+# metadata row numbers: IVF stores them itself, flat and HNSW indexes sit
+# behind an IndexIDMap2.
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+HNSW_M = 32
+PQ_BITS = 8
+TRAIN_POINTS_PER_LIST = 64
+
+
+def default_nlist(ntotal):
+    # ~4 sqrt(n) lists, the usual starting point for IVF
+    return max(1, min(int(4 * math.sqrt(ntotal)), ntotal // 39 or 1))
+
+
+def default_pq_m(dim):
+    # 8 dims per sub-quantizer, falling back to the largest divisor <= that
+    for m in range(dim // 8, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def factory_string(kind, dim, ntotal, nlist=None, pq_m=None, hnsw_m=HNSW_M):
+    if kind == "flat":
+        return "Flat"
+    if kind == "ivf_flat":
+        return f"IVF{nlist or default_nlist(ntotal)},Flat"
+    if kind == "ivf_pq":
+        return f"IVF{nlist or default_nlist(ntotal)},PQ{pq_m or default_pq_m(dim)}x{PQ_BITS}"
+    if kind == "hnsw":
+        return f"HNSW{hnsw_m},Flat"
+    raise ValueError(f"Unknown index type: {kind} (expected one of {', '.join(INDEX_TYPES)})")
+
+
+def flat_vectors(index):
+    """
+    The stored vectors of an exact index, as a float32 array.
+    """
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_ann_index(vectors, kind, nlist=None, pq_m=None, hnsw_m=HNSW_M, seed=0):
+    """
+    Inner-product index of type `kind` over normalized `vectors`.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ntotal, dim = vectors.shape
+
+    spec = factory_string(kind, dim, ntotal, nlist, pq_m, hnsw_m)
+    index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+
+    if not index.is_trained:
+        ivf = faiss.extract_index_ivf(index)
+        n_train = min(ntotal, ivf.nlist * TRAIN_POINTS_PER_LIST)
+        rng = np.random.default_rng(seed)
+        sample = vectors[np.sort(rng.choice(ntotal, n_train, replace=False))]
+        index.train(sample)
+
+    index.add(vectors)
+    return index
+
+
+def is_id_mapped(index):
+    return isinstance(faiss.downcast_index(index), faiss.IndexIDMap2)
+
+
+def _ivf_lists(index):
+    invlists = faiss.extract_index_ivf(index).invlists
+    for list_no in range(invlists.nlist):
+        size = invlists.list_size(list_no)
+        if size:
+            # A writable view of the list's ids
+            yield faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+
+
+def with_ids(index):
+    """
+    `index` ready for add_with_ids()/remove_ids() with ids equal to the
+    current row numbers (see ingest_book.py). IVF indexes store ids
+    themselves; flat and HNSW ones go behind an IndexIDMap2. The stored
+    vectors are kept as they are, not re-added.
+    """
+    if is_id_mapped(index) or index_type(index) in ("ivf_flat", "ivf_pq"):
+        return index
+
+    # IndexIDMap2 only wraps an empty index; hide the rows while wrapping.
+    ntotal = index.ntotal
+    index.ntotal = 0
+    wrapped = faiss.IndexIDMap2(index)
+    index.ntotal = ntotal
+
+    wrapped.ntotal = ntotal
+    faiss.copy_array_to_vector(np.arange(ntotal, dtype=np.int64), wrapped.id_map)
+    wrapped.construct_rev_map()
+    return wrapped
+
+
+def stored_ids(index):
+    """
+    External ids of the stored vectors (in storage order for IndexIDMap2).
+    """
+    if is_id_mapped(index):
+        return faiss.vector_to_array(faiss.downcast_index(index).id_map)
+    if index_type(index) in ("ivf_flat", "ivf_pq"):
+        return np.concatenate([np.array(ids) for ids in _ivf_lists(index)] or [np.empty(0, np.int64)])
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def remove_ids(index, ids):
+    """
+    Drop `ids` from an index prepared by with_ids(). Returns how many were
+    removed, or None when the index can't remove vectors (HNSW); those
+    stay until compact_ids().
+    """
+    if index_type(index) == "hnsw":
+        return None
+    return index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+
+def compact_ids(index, new_ids):
+    """
+    Renumber an index prepared by with_ids() after rows were dropped:
+    `new_ids[old]` is the new id of each old id, or -1 for dropped rows.
+    Vectors whose id maps to -1 are removed (for HNSW, by rebuilding the
+    graph from the rest). Returns the compacted index.
+    """
+    dead = stored_ids(index)
+    dead = dead[new_ids[dead] < 0]
+
+    if len(dead) and remove_ids(index, dead) is None:
+        old_ids = stored_ids(index)
+        keep = new_ids[old_ids] >= 0
+        inner = inner_index(index)
+        vectors = inner.reconstruct_n(0, inner.ntotal)[keep]
+        index = with_ids(build_ann_index(vectors, "hnsw", hnsw_m=inner.hnsw.nb_neighbors(1)))
+        faiss.copy_array_to_vector(old_ids[keep], index.id_map)
+
+    if is_id_mapped(index):
+        old_ids = stored_ids(index)
+        faiss.copy_array_to_vector(new_ids[old_ids].astype(np.int64), index.id_map)
+        index.construct_rev_map()
+    else:
+        for ids in _ivf_lists(index):
+            ids[:] = new_ids[ids]
+
+    return index
+
+
+def inner_index(index):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_type(index):
+    index = inner_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def search(index, queries, k, nprobe=None, ef_search=None):
+    """
+    index.search() with per-call search breadth. Parameters that don't
+    apply to the index type are ignored; None keeps the index default.
+
+    Missing neighbours (possible with IVF and a small nprobe) come back as
+    -1, as from faiss.
+    """
+    params = None
+    kind = index_type(index)
+
+    if kind in ("ivf_flat", "ivf_pq") and nprobe:
+        params = faiss.SearchParametersIVF(nprobe=int(nprobe))
+    elif kind == "hnsw" and ef_search:
+        params = faiss.SearchParametersHNSW(efSearch=int(max(ef_search, k)))
+
+    if params is None:
+        return index.search(queries, k)
+    return index.search(queries, k, params=params)
+
+
+def index_bytes(index):
+    return len(faiss.serialize_index(index))
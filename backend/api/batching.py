@@ -0,0 +1,208 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+
+# Cross-request micro-batching for the sentence encoders.
+#
+# Every image search encodes only a handful of OCR chunks. Under concurrent
+# load that means many tiny forward passes; instead each caller queues its
+# chunks here and blocks, and one thread per model gathers whatever arrives
+# within MAX_WAIT_MS (or until MAX_BATCH_SIZE texts), encodes them in a
+# single pass and hands every caller back its own rows.
+#
+#   LEAFLENS_BATCH_SIZE=64       most texts per forward pass
+#   LEAFLENS_BATCH_WAIT_MS=5     longest a request waits for company
+#                                (0 batches only what is already queued)
+
+MAX_BATCH_SIZE = int(os.environ.get("LEAFLENS_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.environ.get("LEAFLENS_BATCH_WAIT_MS", "5"))
+
+BATCH_SIZE_BOUNDS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+WAIT_MS_BOUNDS = [0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram ("le_<bound>": count of values <= bound).
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        buckets = {}
+        running = 0
+        for bound, n in zip(self.bounds + ["inf"], self.counts):
+            running += n
+            buckets[f"le_{bound}"] = running
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "buckets": buckets,
+        }
+
+
+class _Request:
+    def __init__(self, texts):
+        self.texts = texts
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Batches encode() calls from many threads into few `encode_fn` calls.
+
+    `encode_fn(texts)` must return one row per text, in order.
+    """
+
+    def __init__(self, name, encode_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.name = name
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._carry = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.texts = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BOUNDS)
+        self.queue_wait_ms = Histogram(WAIT_MS_BOUNDS)
+
+        _batchers.append(self)
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return self.encode_fn(texts)
+
+        self._ensure_thread()
+
+        request = _Request(texts)
+        self._queue.put(request)
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batcher-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self):
+        # A request that didn't fit the previous batch opens the next one.
+        first = self._carry or self._queue.get()
+        self._carry = None
+
+        batch = [first]
+        size = len(first.texts)
+        deadline = first.enqueued + self.max_wait
+
+        while size < self.max_batch_size:
+            try:
+                timeout = deadline - time.perf_counter()
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if size + len(request.texts) > self.max_batch_size:
+                self._carry = request
+                break
+
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    def _run(self):
+        try:
+            while True:
+                self._serve(self._collect())
+        finally:
+            # Only reached through a BaseException, which _serve re-raises
+            # after failing its batch: hand the queue to a fresh worker.
+            with self._lock:
+                self._thread = None
+            self._ensure_thread()
+
+    def _serve(self, batch):
+        started = time.perf_counter()
+        texts = [text for request in batch for text in request.texts]
+
+        try:
+            vectors = np.asarray(self.encode_fn(texts))
+
+            with self._lock:
+                self.batches += 1
+                self.texts += len(texts)
+                self.batch_sizes.observe(len(texts))
+                for request in batch:
+                    self.queue_wait_ms.observe((started - request.enqueued) * 1000)
+
+            offset = 0
+            for request in batch:
+                request.result = vectors[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+                request.done.set()
+        except Exception as e:
+            for request in batch:
+                if not request.done.is_set():
+                    request.error = e
+        except BaseException as e:
+            for request in batch:
+                if not request.done.is_set():
+                    request.error = RuntimeError(f"Batcher {self.name} worker died: {e!r}")
+            raise
+        finally:
+            # No caller is left waiting, whatever happened above.
+            for request in batch:
+                request.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "texts": self.texts,
+                "batch_size": self.batch_sizes.snapshot(),
+                "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            }
+
+
+_batchers = []
+
+
+def all_batchers():
+    return list(_batchers)
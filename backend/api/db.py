@@ -0,0 +1,160 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# Shared read-only SQLite connections for the request paths.
+#
+# Connections are opened once (mode=ro, query_only) and handed out one
+# request at a time. mmap_size lets SQLite read pages straight out of the OS
+# page cache, which every worker process on the host shares.
+
+POOL_SIZE = 4
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+ACQUIRE_TIMEOUT = 10.0
+
+
+class ReadOnlyPool:
+    """
+    Fixed-size, thread-safe pool of read-only connections to one database.
+
+    An idle slot holds None after its connection failed; it is reopened by
+    the next caller that takes it.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._stats = {
+            "opened": 0,
+            "acquired": 0,
+            "waited": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+
+        for _ in range(size):
+            self._idle.put(self._open())
+
+    def _open(self):
+        uri = Path(os.path.abspath(self.db_path)).as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA query_only=ON")
+
+        with self._lock:
+            self._stats["opened"] += 1
+
+        return conn
+
+    @contextmanager
+    def connection(self, timeout=ACQUIRE_TIMEOUT):
+        start = time.perf_counter()
+
+        try:
+            conn = self._idle.get_nowait()
+            waited = False
+        except queue.Empty:
+            waited = True
+            try:
+                conn = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise TimeoutError(f"No free connection to {self.db_path}")
+
+        wait_ms = (time.perf_counter() - start) * 1000
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except BaseException:
+                self._idle.put(None)
+                raise
+
+        with self._lock:
+            self._stats["acquired"] += 1
+            if waited:
+                self._stats["waited"] += 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            # A connection that failed mid-query is replaced, not reused.
+            with self._lock:
+                self._stats["errors"] += 1
+            conn.close()
+            conn = None
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+
+        stats["wait_ms_total"] = round(stats["wait_ms_total"], 2)
+        stats["wait_ms_max"] = round(stats["wait_ms_max"], 2)
+
+        idle = self._idle.qsize()
+        stats.update({
+            "db_path": self.db_path,
+            "size": self.size,
+            "idle": idle,
+            "in_use": self.size - idle,
+            # > 1 means connections are being reused rather than reopened
+            "reuse_ratio": round(stats["acquired"] / max(stats["opened"], 1), 2),
+        })
+        return stats
+
+    def health(self):
+        """
+        Run a trivial query on a pooled connection.
+        """
+        try:
+            with self.connection(timeout=1.0) as conn:
+                conn.execute("SELECT 1").fetchone()
+            return {"status": "ok", **self.stats()}
+        except (sqlite3.Error, TimeoutError) as e:
+            return {"status": "error", "error": str(e), **self.stats()}
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """
+    The process-wide pool for `db_path`, opened on first use.
+    """
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ReadOnlyPool(db_path)
+        return _pools[db_path]
+
+
+def all_pools():
+    with _pools_lock:
+        return list(_pools.values())
@@ -0,0 +1,86 @@
+import numpy as np
+
+from backend.api.schema import SCHEMA_V2, get_schema_version, hex_hash_to_int, table_exists
+
+
+# Document frequency per fingerprint hash: the number of distinct books it
+# occurs in. Only hashes shared by two or more books are stored; anything
+# missing has df = 1.
+#
+# Hashes above a cutoff ("stop fingerprints") come from licence text and
+# stock phrases. They can be deleted from the index or skipped at query time.
+
+
+def build_doc_freq(conn):
+    """
+    (Re)build fingerprint_df from the fingerprints table. Returns the
+    number of shared hashes.
+    """
+    version = get_schema_version(conn)
+    c = conn.cursor()
+
+    c.execute("DROP TABLE IF EXISTS fingerprint_df")
+
+    if version == SCHEMA_V2:
+        c.execute("""
+            CREATE TABLE fingerprint_df (
+                hash INTEGER PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        c.execute("""
+            INSERT INTO fingerprint_df (hash, df)
+            SELECT hash, COUNT(DISTINCT book_key) FROM fingerprints
+            GROUP BY hash HAVING COUNT(DISTINCT book_key) > 1
+        """)
+    else:
+        c.execute("""
+            CREATE TABLE fingerprint_df (
+                hash TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        c.execute("""
+            INSERT INTO fingerprint_df (hash, df)
+            SELECT hash, COUNT(DISTINCT book_id) FROM fingerprints
+            GROUP BY hash HAVING COUNT(DISTINCT book_id) > 1
+        """)
+
+    conn.commit()
+
+    return c.execute("SELECT COUNT(*) FROM fingerprint_df").fetchone()[0]
+
+
+def prune_fingerprints(conn, max_df):
+    """
+    Delete every fingerprint whose hash occurs in more than `max_df` books.
+    Returns the number of rows removed.
+    """
+    c = conn.cursor()
+    c.execute(
+        "DELETE FROM fingerprints WHERE hash IN "
+        "(SELECT hash FROM fingerprint_df WHERE df > ?)",
+        (max_df,),
+    )
+    removed = c.rowcount
+    conn.commit()
+    return removed
+
+
+def load_stop_hashes(conn, max_df):
+    """
+    Sorted int64 array of hashes that occur in more than `max_df` books.
+    Empty when the df table has not been built.
+    """
+    if not table_exists(conn, "fingerprint_df"):
+        return np.empty(0, dtype=np.int64)
+
+    rows = [
+        row[0]
+        for row in conn.execute("SELECT hash FROM fingerprint_df WHERE df > ?", (max_df,))
+    ]
+
+    if get_schema_version(conn) != SCHEMA_V2:
+        rows = [hex_hash_to_int(h) for h in rows]
+
+    return np.sort(np.array(rows, dtype=np.int64))
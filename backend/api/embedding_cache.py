@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# LRU cache of chunk embeddings keyed on (model, normalized chunk text).
+#
+# Popular pages produce the same cleaned OCR chunks request after request;
+# those skip the encoder entirely. Bounded by the bytes of the cached
+# vectors plus their keys:
+#
+#   LEAFLENS_EMBED_CACHE_MB=64     0 disables caching
+
+MAX_BYTES = int(float(os.environ.get("LEAFLENS_EMBED_CACHE_MB", "64")) * 1024 * 1024)
+
+
+def cache_key(model, text):
+    return model, " ".join(text.split())
+
+
+class EmbeddingCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _entry_bytes(self, key, vector):
+        return vector.nbytes + len(key[1])
+
+    def _put(self, key, vector):
+        if key in self._entries:
+            return
+
+        size = self._entry_bytes(key, vector)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = vector
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            old_key, old_vector = self._entries.popitem(last=False)
+            self._bytes -= self._entry_bytes(old_key, old_vector)
+            self._stats["evictions"] += 1
+
+    def encode(self, model, texts, encode_fn):
+        """
+        Embeddings of `texts` (one row each, in order), calling
+        encode_fn(list_of_texts) only for texts not cached under `model`.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.asarray(encode_fn(texts))
+
+        keys = [cache_key(model, t) for t in texts]
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+
+            # Duplicates within one request count once, as one encode.
+            missing = list(dict.fromkeys(k for k in keys if k not in found))
+            self._stats["hits"] += sum(k in found for k in keys)
+            self._stats["misses"] += len(missing)
+
+        if missing:
+            text_of = dict(zip(keys, texts))
+            vectors = np.asarray(encode_fn([text_of[k] for k in missing]))
+
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    vector = vector.copy()
+                    vector.flags.writeable = False
+                    found[key] = vector
+                    if self.max_bytes > 0:
+                        self._put(key, vector)
+
+        return np.stack([found[k] for k in keys])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["max_bytes"] = self.max_bytes
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else None
+        return stats
+
+
+# One cache per process, shared by every model and pipeline.
+embedding_cache = EmbeddingCache()
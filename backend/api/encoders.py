@@ -0,0 +1,91 @@
+import os
+
+
+# Inference backends for the sentence encoders (MiniLM, MPNet).
+#
+#   torch       PyTorch SentenceTransformer on CPU (the original path)
+#   onnx        ONNX Runtime on <model dir>/onnx/model.onnx
+#   onnx_int8   ONNX Runtime on a dynamically int8-quantized copy,
+#               <model dir>/onnx/model_qint8_<QUANT_CONFIG>.onnx
+#
+# LEAFLENS_ENCODER_BACKEND picks the backend for every encoder;
+# LEAFLENS_MINILM_BACKEND / LEAFLENS_MPNET_BACKEND override it per model.
+# The ONNX files are written by export_onnx.py. QUANT_CONFIG names the
+# instruction set the int8 kernels were tuned for: avx512_vnni (recent
+# Xeons), avx512, avx2, or arm64.
+
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+ENCODER_BACKEND = os.environ.get("LEAFLENS_ENCODER_BACKEND", "torch")
+QUANT_CONFIG = os.environ.get("LEAFLENS_ONNX_QUANT", "avx512_vnni")
+QUANT_CONFIGS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+ONNX_FILE = "onnx/model.onnx"
+
+
+def backend_for(model_key):
+    return os.environ.get(f"LEAFLENS_{model_key.upper()}_BACKEND", ENCODER_BACKEND)
+
+
+def onnx_file(backend, quant_config=QUANT_CONFIG):
+    if backend == "onnx":
+        return ONNX_FILE
+    if backend == "onnx_int8":
+        return f"onnx/model_qint8_{quant_config}.onnx"
+    raise ValueError(f"{backend} has no ONNX file")
+
+
+def ensure_local(model_name, save_path):
+    """
+    Download `model_name` into `save_path` once.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if not os.path.exists(save_path):
+        model = SentenceTransformer(model_name)
+        os.makedirs(save_path, exist_ok=True)
+        model.save(save_path)
+
+
+def load_encoder(save_path, backend=ENCODER_BACKEND, quant_config=QUANT_CONFIG):
+    # Imported here so text-only workers never pull in torch.
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+    if backend == "torch":
+        return SentenceTransformer(save_path, device="cpu")
+
+    file_name = onnx_file(backend, quant_config)
+    if not os.path.exists(os.path.join(save_path, file_name)):
+        raise FileNotFoundError(
+            f"{os.path.join(save_path, file_name)} not found; run export_onnx.py first"
+        )
+
+    return SentenceTransformer(
+        save_path,
+        device="cpu",
+        backend="onnx",
+        model_kwargs={"file_name": file_name},
+    )
+
+
+def export_onnx(save_path, quant_configs=()):
+    """
+    Write onnx/model.onnx next to the PyTorch weights in `save_path`, plus
+    one int8 copy per entry in `quant_configs`. Returns the written paths.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    # With no ONNX file present, backend="onnx" exports from the PyTorch
+    # weights on load.
+    model = SentenceTransformer(save_path, device="cpu", backend="onnx")
+    model.save_pretrained(save_path)
+    written = [os.path.join(save_path, ONNX_FILE)]
+
+    for config in quant_configs:
+        export_dynamic_quantized_onnx_model(model, config, save_path)
+        written.append(os.path.join(save_path, onnx_file("onnx_int8", config)))
+
+    return written
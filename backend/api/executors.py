@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+# Bounded pools for the blocking search pipelines, so an OCR call never runs
+# on the event loop and cheap text searches don't queue behind image work.
+#
+# Each pool admits at most `workers + max_queue` requests; past that,
+# submit() and run() raise PoolFullError at once and the API answers 429 instead of
+# letting latency pile up.
+#
+#   LEAFLENS_TEXT_WORKERS=4        LEAFLENS_TEXT_QUEUE=32
+#   LEAFLENS_IMAGE_WORKERS=2       LEAFLENS_IMAGE_QUEUE=8
+#   LEAFLENS_TEXT_EXECUTOR=thread  LEAFLENS_IMAGE_EXECUTOR=thread
+#
+# "process" pools sidestep the GIL but each worker process loads its own
+# components (and batches encoder calls only among its own requests).
+
+THREAD = "thread"
+PROCESS = "process"
+
+
+class PoolFullError(Exception):
+    def __init__(self, name):
+        super().__init__(f"The {name} search pool is full")
+        self.name = name
+
+
+class BoundedExecutor:
+    def __init__(self, name, workers, max_queue, kind=THREAD):
+        if kind not in (THREAD, PROCESS):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+        }
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                if self.kind == PROCESS:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix=f"{self.name}-search"
+                    )
+            return self._pool
+
+    def submit(self, fn, *args):
+        """
+        Schedule fn(*args) on the pool and return an awaitable future.
+        Raises PoolFullError without waiting when every slot is taken.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise PoolFullError(self.name)
+
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(
+                self._stats["max_in_flight"], self._stats["in_flight"]
+            )
+
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._finished(None)
+            raise
+
+        # The slot is freed when the work ends, not when the caller stops
+        # waiting (a disconnected client doesn't cancel a running search).
+        future.add_done_callback(self._finished)
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn, *args):
+        """
+        Run fn(*args) on the pool and await the result.
+        """
+        return await self.submit(fn, *args)
+
+    def _finished(self, future):
+        self._slots.release()
+        failed = future is None or future.cancelled() or future.exception() is not None
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            self._stats["failed" if failed else "completed"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+
+        stats.update({
+            "name": self.name,
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+        })
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def _from_env(name, workers, max_queue):
+    prefix = f"LEAFLENS_{name.upper()}_"
+    return BoundedExecutor(
+        name,
+        workers=int(os.environ.get(prefix + "WORKERS", workers)),
+        max_queue=int(os.environ.get(prefix + "QUEUE", max_queue)),
+        kind=os.environ.get(prefix + "EXECUTOR", THREAD),
+    )
+
+
+text_executor = _from_env("text", workers=4, max_queue=32)
+image_executor = _from_env("image", workers=2, max_queue=8)
+
+
+def all_executors():
+    return [text_executor, image_executor]
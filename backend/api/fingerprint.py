@@ -0,0 +1,158 @@
+import hashlib
+import numpy as np
+
+from backend.api.schema import get_meta, set_meta
+
+
+# Window fingerprinting shared by the indexer and the text search.
+#
+# FP_MD5:     md5 of each space-joined window, first 16 hex chars. Every
+#             database built before fingerprint versions existed uses this.
+# FP_ROLLING: every word is hashed once, then all windows are combined with
+#             a polynomial rolling hash mod 2^64 over the word ids.
+#
+# Hashes are returned as signed int64, the value a v2 INTEGER column stores.
+#
+# Optional winnowing keeps only the minimum hash of every k consecutive
+# window hashes. The index and the query must winnow with the same k; the
+# value is recorded next to the fingerprint version.
+
+FP_MD5 = 1
+FP_ROLLING = 2
+
+LATEST_FINGERPRINT = FP_ROLLING
+
+ROLLING_BASE = np.uint64(0x100000001B3)
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_WINDOW_SALT = 0x9E3779B97F4A7C15
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+
+def get_fingerprint_version(conn):
+    """
+    Databases without a recorded version were built with MD5.
+    """
+    return int(get_meta(conn, "fingerprint_version", FP_MD5))
+
+
+def set_fingerprint_version(conn, version):
+    set_meta(conn, "fingerprint_version", version)
+
+
+def get_winnow_k(conn):
+    """
+    1 means dense: every window is stored.
+    """
+    return int(get_meta(conn, "winnow_k", 1))
+
+
+def set_winnow_k(conn, k):
+    set_meta(conn, "winnow_k", k)
+
+
+def word_ids(words):
+    """
+    64-bit id per word. Each distinct word is hashed only once.
+    """
+    vocab = {}
+    ids = np.empty(len(words), dtype=np.uint64)
+
+    for i, word in enumerate(words):
+        wid = vocab.get(word)
+        if wid is None:
+            wid = int.from_bytes(
+                hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            vocab[word] = wid
+        ids[i] = wid
+
+    return ids
+
+
+def _mix(h, window_size):
+    # splitmix64 finalizer, salted by window size so the 6/7/8-word hashes
+    # of overlapping windows do not share structure.
+    h = h ^ np.uint64((window_size * _WINDOW_SALT) & _MASK_64)
+    h = (h ^ (h >> np.uint64(30))) * _MIX_1
+    h = (h ^ (h >> np.uint64(27))) * _MIX_2
+    return h ^ (h >> np.uint64(31))
+
+
+def rolling_window_hashes(ids, window_sizes):
+    """
+    {window_size: uint64 hashes} for every window start, built incrementally:
+    H[w + 1][i] = H[w][i] * B + ids[i + w].
+    """
+    out = {}
+    wanted = set(window_sizes)
+    h = ids.copy()
+
+    for w in range(1, max(window_sizes) + 1):
+        if w > 1:
+            h = h[:-1] * ROLLING_BASE + ids[w - 1:]
+        if w in wanted:
+            out[w] = _mix(h, w)
+        if len(h) <= 1:
+            break
+
+    return out
+
+
+def _md5_windows(words, window_size):
+    hashes = []
+    for i in range(0, len(words) - window_size + 1):
+        window = " ".join(words[i:i + window_size])
+        hashes.append(int(hashlib.md5(window.encode("utf-8")).hexdigest()[:16], 16))
+    return np.array(hashes, dtype=np.uint64)
+
+
+def winnow(hashes, k):
+    """
+    Positions selected by winnowing: in every run of k consecutive hashes,
+    the minimum (rightmost on ties). Sequences shorter than k keep their
+    overall minimum.
+    """
+    n = len(hashes)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k <= 1:
+        return np.arange(n, dtype=np.int64)
+    if n < k:
+        return np.array([n - 1 - np.argmin(hashes[::-1])], dtype=np.int64)
+
+    windows = np.lib.stride_tricks.sliding_window_view(hashes[::-1], k)
+    rightmost = n - 1 - (np.arange(n - k + 1) + np.argmin(windows, axis=1))
+
+    return np.unique(rightmost)
+
+
+def fingerprint_windows(words, window_sizes, version=FP_MD5, winnow_k=1):
+    """
+    Fingerprint every window of every size in `window_sizes`.
+
+    Returns (hashes, positions) as int64 arrays, grouped by window size in
+    the order given, each group in word order. With winnow_k > 1 each group
+    is winnowed on its own.
+    """
+    hashes = []
+    positions = []
+
+    if version == FP_ROLLING:
+        by_size = rolling_window_hashes(word_ids(words), window_sizes) if words else {}
+    elif version == FP_MD5:
+        by_size = {w: _md5_windows(words, w) for w in window_sizes}
+    else:
+        raise ValueError(f"Unknown fingerprint version: {version}")
+
+    for w in window_sizes:
+        n = max(len(words) - w + 1, 0)
+        group = by_size.get(w, np.empty(0, dtype=np.uint64))[:n].astype(np.uint64).view(np.int64)
+
+        keep = winnow(group, winnow_k)
+        hashes.append(group[keep])
+        positions.append(keep)
+
+    return np.concatenate(hashes), np.concatenate(positions)
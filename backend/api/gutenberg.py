@@ -0,0 +1,38 @@
+import re
+
+
+# Project Gutenberg files wrap every book in the same license header and
+# footer. Left in, those passages fingerprint identically across the whole
+# corpus.
+
+START_MARKERS = [
+    re.compile(r"^\*{3}\s*START OF (THE|THIS) PROJECT GUTENBERG E-?BOOK.*$", re.I | re.M),
+    re.compile(r"^\*END\*THE SMALL PRINT!.*$", re.I | re.M),
+]
+
+END_MARKERS = [
+    re.compile(r"^\*{3}\s*END OF (THE|THIS) PROJECT GUTENBERG E-?BOOK.*$", re.I | re.M),
+    re.compile(r"^End of (the )?Project Gutenberg'?s? .*$", re.I | re.M),
+]
+
+
+def strip_gutenberg(text):
+    """
+    Return only the body between the Gutenberg start and end markers.
+    Text without markers is returned unchanged.
+    """
+    start = 0
+    for marker in START_MARKERS:
+        m = marker.search(text)
+        if m:
+            start = m.end()
+            break
+
+    end = len(text)
+    for marker in END_MARKERS:
+        m = marker.search(text, start)
+        if m:
+            end = m.start()
+            break
+
+    return text[start:end]
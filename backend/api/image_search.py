@@ -1,29 +1,57 @@
-import easyocr
 import re
 import os
+import threading
 import faiss
 import numpy as np
-import sqlite3
 import cv2
 import time
 from datetime import datetime
-from sentence_transformers import SentenceTransformer
-from collections import Counter, defaultdict
+from collections import Counter
+
+from backend.api import model_loader
+from backend.api.ann import search as ann_search
+from backend.api.batching import MAX_BATCH_SIZE, MicroBatcher
+from backend.api.db import get_pool
+from backend.api.embedding_cache import embedding_cache
+from backend.api.embedding_store import open_store
+from backend.api.encoders import backend_for, ensure_local, load_encoder
+from backend.api.meta_store import MetaStore, convert_legacy_meta, is_meta_store
+from backend.api.ocr_cache import OCRCache
+from backend.api.ocr_preprocess import DEFAULT_MODE as DEFAULT_OCR_MODE, preprocess
+from backend.api.text_search import run_text_search, run_text_search_batch
 
 
 # CONFIG
 INDEX_PATH = r"C:\Users\DELL\Desktop\LeafLens\books.index"
 META_PATH = r"C:\Users\DELL\Desktop\LeafLens\books_meta.npy"
+# Columnar metadata (see backend/api/meta_store.py), converted from META_PATH
+# on first start if missing.
+META_STORE_DIR = r"C:\Users\DELL\Desktop\LeafLens\books_meta"
 MPNET_EMB_PATH = r"C:\Users\DELL\Desktop\LeafLens\mpnet_embeddings.npy"
+# Pre-normalized, memory-mapped copy written by build_mpnet.py
+MPNET_STORE_PATH = r"C:\Users\DELL\Desktop\LeafLens\mpnet_store.npy"
+# Disk tier of the OCR result cache (None keeps it in memory only)
+OCR_CACHE_PATH = r"C:\Users\DELL\Desktop\LeafLens\ocr_cache.db"
+# Also reuse OCR for near-identical photos within this many dHash bits
+# (e.g. 4); None matches exact pixels only
+OCR_CACHE_PHASH_DISTANCE = None
 DB_PATH = r"C:\Users\DELL\Desktop\LeafLens\books.db"
 
 OCR_CHUNK_SIZE = 450
 TOP_K = 6
+# Search breadth when INDEX_PATH is an approximate index (build_ann_index.py);
+# ignored for the exact flat index.
+FAISS_NPROBE = 16
+FAISS_EF_SEARCH = 64
 MAX_RERANK_PREVIEWS = 12
 
 CONFIDENCE_THRESHOLD = 0.25
 MIN_VOTE_ACCEPT = 3
 
+# Try the fingerprint engine on the OCR text before the neural path; a
+# "success" there skips MiniLM, FAISS and MPNet entirely.
+CASCADE = True
+
 MPNET_DIR = "./models/mpnet"
 MINILM_DIR = "./models/minilm"
 
@@ -56,14 +84,11 @@ def is_anthology(title):
     return any(word in title.lower() for word in ANTHOLOGY_KEYWORDS)
 
 
-def load_model_local(model_name, save_path):
+def load_model_local(model_name, save_path, backend="torch"):
     start = time.time()
-    if not os.path.exists(save_path):
-        model = SentenceTransformer(model_name)
-        os.makedirs(save_path, exist_ok=True)
-        model.save(save_path)
-    model = SentenceTransformer(save_path)
-    log_stage(f"Loaded model: {model_name}", start)
+    ensure_local(model_name, save_path)
+    model = load_encoder(save_path, backend)
+    log_stage(f"Loaded model: {model_name} ({backend})", start)
     return model
 
 
@@ -75,24 +100,23 @@ def is_mostly_english(text):
 def get_author_from_db(book_id: str) -> str:
     start = time.time()
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
     book_id = book_id.replace(".txt", "").lower()
 
-    row = c.execute(
-        "SELECT author FROM books WHERE LOWER(book_id)=?",
-        (book_id,),
-    ).fetchone()
-
-    conn.close()
+    with get_pool(DB_PATH).connection() as conn:
+        row = conn.execute(
+            "SELECT author FROM books WHERE LOWER(book_id)=?",
+            (book_id,),
+        ).fetchone()
 
     log_stage("Database author lookup", start)
 
     return row[0] if row and row[0].strip() else "Unknown"
 
 # OCR
-def extract_text(image_path):
+ocr_cache = OCRCache(OCR_CACHE_PATH, phash_max_distance=OCR_CACHE_PHASH_DISTANCE)
+
+
+def extract_text(image_path, mode=DEFAULT_OCR_MODE):
     start = time.time()
 
     img = cv2.imread(image_path)
@@ -100,18 +124,23 @@ def extract_text(image_path):
     if img is None:
         return ""
 
-    h, w = img.shape[:2]
-    max_dim = 1200
+    cache_keys = ocr_cache.keys(img, variant=mode)
+    cached = ocr_cache.get(cache_keys)
+    if cached is not None:
+        log_stage("OCR cache hit", start)
+        return cached
+
+    img, info = preprocess(img, mode)
+    log_stage(f"OCR preprocessing {info}", start)
 
-    if max(h, w) > max_dim:
-        scale = max_dim / max(h, w)
-        img = cv2.resize(img, (int(w * scale), int(h * scale)))
+    result = get_reader().readtext(img, detail=0)
+    text = " ".join(result)
 
-    result = reader.readtext(img, detail=0)
+    ocr_cache.put(cache_keys, text)
 
     log_stage("OCR extraction", start)
 
-    return " ".join(result)
+    return text
 
 
 def clean_text(text):
@@ -137,122 +166,320 @@ def chunk_text(text):
     return chunks
 
 # FAST SEARCH
-def fast_search(chunks):
+def fast_search(chunks, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH):
     start = time.time()
 
-    emb = miniLM.encode(chunks, batch_size=8).astype("float32")
+    emb = embedding_cache.encode("minilm", chunks, minilm_batcher.encode).astype("float32")
     faiss.normalize_L2(emb)
 
-    D, I = index.search(emb, TOP_K)
+    D, I = ann_search(get_faiss_index(), emb, TOP_K, nprobe=nprobe, ef_search=ef_search)
 
-    candidates = []
-    for neighbors in I:
-        for idx in neighbors:
-            candidates.append(metadata[idx]["book"])
+    # -1 marks a missing neighbour (IVF with a small nprobe); rows of
+    # removed books stay in the index until ingest_book.py compact
+    metadata = get_metadata()
+    rows = I.ravel()
+    candidates = metadata.books(metadata.live(rows[rows >= 0])).tolist()
 
     log_stage("MiniLM encode + FAISS search", start)
 
     return candidates
 
+
+def fast_search_many(chunk_lists, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH):
+    """
+    fast_search for several chunk lists: one MiniLM pass over every chunk
+    and one FAISS search for all of them.
+    """
+    start = time.time()
+
+    chunks = [chunk for chunks in chunk_lists for chunk in chunks]
+    if not chunks:
+        return [[] for _ in chunk_lists]
+
+    emb = embedding_cache.encode("minilm", chunks, minilm_batcher.encode).astype("float32")
+    faiss.normalize_L2(emb)
+
+    D, I = ann_search(get_faiss_index(), emb, TOP_K, nprobe=nprobe, ef_search=ef_search)
+
+    metadata = get_metadata()
+    results = []
+    end = 0
+    for chunks in chunk_lists:
+        rows = I[end:end + len(chunks)].ravel()
+        end += len(chunks)
+        results.append(metadata.books(metadata.live(rows[rows >= 0])).tolist())
+
+    log_stage(f"MiniLM encode + FAISS search ({len(chunk_lists)} items)", start)
+
+    return results
+
 # RERANK
-def rerank_candidates(chunks, candidate_books):
+def rerank_candidates(chunks, candidate_books, emb_query=None):
     start = time.time()
 
     if not candidate_books:
         return None, 0
 
-    emb_query = mpnet.encode(chunks, batch_size=8)
+    # emb_query: MPNet embeddings of `chunks`, when already encoded
+    if emb_query is None:
+        emb_query = embedding_cache.encode("mpnet", chunks, mpnet_batcher.encode)
     emb_query = emb_query / np.linalg.norm(emb_query, axis=1, keepdims=True)
 
-    scores = {}
+    metadata = get_metadata()
+    mpnet_embeddings = get_mpnet_embeddings()
+
+    books = np.unique([
+        metadata.book_index[name] for name in set(candidate_books) if name in metadata.book_index
+    ])
+    rows, counts = metadata.rows_of_books(books, MAX_RERANK_PREVIEWS)
+
+    books, counts = books[counts > 0], counts[counts > 0]
+    if not len(books):
+        return None, 0
 
-    for book in set(candidate_books):
+    # One (rows x chunks) similarity matrix for every candidate; a book's
+    # score is the mean over its block, i.e. the mean of its row means.
+    sim = np.dot(mpnet_embeddings[rows].astype(np.float32), emb_query.T)
+    row_means = sim.mean(axis=1)
+    seg_starts = np.cumsum(counts) - counts
+    scores = np.add.reduceat(row_means, seg_starts) / counts.astype(np.float32)
 
-        preview_indices = book_to_indices.get(book, [])[:MAX_RERANK_PREVIEWS]
+    scores[get_anthology_flags()[books]] *= 0.80
 
-        if not preview_indices:
-            continue
+    best = int(np.argmax(scores))
+    best_book = str(metadata.book_names[books[best]])
 
-        emb_book = mpnet_embeddings[preview_indices]
-        sim = np.dot(emb_query, emb_book.T)
-        score = sim.mean()
+    log_stage("MPNet reranking", start)
 
-        if is_anthology(book):
-            score *= 0.80
+    return best_book, scores[best]
 
-        scores[book] = score
 
-    if not scores:
-        return None, 0
+# COMPONENTS (loaded lazily, see model_loader.py)
+def _load_reader():
+    import easyocr
 
-    best_book = max(scores, key=scores.get)
+    return easyocr.Reader(["en"], gpu=False)
 
-    log_stage("MPNet reranking", start)
 
-    return best_book, scores[best_book]
+def _load_index():
+    return faiss.read_index(INDEX_PATH)
+
 
+def _load_metadata():
+    if not is_meta_store(META_STORE_DIR):
+        print(f"Converting {META_PATH} to {META_STORE_DIR}")
+        convert_legacy_meta(META_PATH, META_STORE_DIR)
+    return MetaStore(META_STORE_DIR)
 
-# LOAD EVERYTHING
-print("================================")
-print("System Initializing...")
-print("================================")
 
-reader_start = time.time()
-reader = easyocr.Reader(["en"], gpu=False)
-log_stage("EasyOCR loaded", reader_start)
+def _build_anthology_flags():
+    return np.array([is_anthology(name) for name in get_metadata().book_names.tolist()], dtype=bool)
 
-miniLM = load_model_local("all-MiniLM-L6-v2", MINILM_DIR)
-mpnet = load_model_local("sentence-transformers/all-mpnet-base-v2", MPNET_DIR)
 
-start = time.time()
-index = faiss.read_index(INDEX_PATH)
-log_stage("FAISS index loaded", start)
+def _load_mpnet_embeddings():
+    if os.path.exists(MPNET_STORE_PATH):
+        return open_store(MPNET_STORE_PATH)
 
-start = time.time()
-metadata = np.load(META_PATH, allow_pickle=True)
-log_stage("Metadata loaded", start)
+    print(f"{MPNET_STORE_PATH} not found, normalizing {MPNET_EMB_PATH} in memory")
+    mpnet_embeddings = np.load(MPNET_EMB_PATH)
+    return mpnet_embeddings / np.linalg.norm(
+        mpnet_embeddings, axis=1, keepdims=True
+    )
 
-start = time.time()
-mpnet_embeddings = np.load(MPNET_EMB_PATH)
-mpnet_embeddings = mpnet_embeddings / np.linalg.norm(
-    mpnet_embeddings, axis=1, keepdims=True
+
+def _touch_pages(arr):
+    # Read one value per 4 KB page so the first request doesn't fault them in.
+    flat = arr.reshape(-1)
+    step = max(4096 // flat.itemsize, 1)
+    return float(flat[::step].sum())
+
+
+def _warmup_index(index):
+    query = np.random.default_rng(0).standard_normal((1, index.d)).astype("float32")
+    faiss.normalize_L2(query)
+    ann_search(index, query, TOP_K, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH)
+
+
+model_loader.register(
+    "ocr", _load_reader,
+    warmup=lambda r: r.readtext(np.full((64, 256, 3), 255, dtype=np.uint8), detail=0),
+)
+model_loader.register(
+    "minilm", lambda: load_model_local("all-MiniLM-L6-v2", MINILM_DIR, backend_for("minilm")),
+    warmup=lambda m: m.encode(["warmup sentence"], batch_size=1),
 )
-log_stage("MPNet embeddings loaded + normalized", start)
+model_loader.register(
+    "mpnet", lambda: load_model_local(
+        "sentence-transformers/all-mpnet-base-v2", MPNET_DIR, backend_for("mpnet")
+    ),
+    warmup=lambda m: m.encode(["warmup sentence"], batch_size=1),
+)
+model_loader.register("faiss_index", _load_index, warmup=_warmup_index)
+model_loader.register("metadata", _load_metadata)
+model_loader.register("anthology_flags", _build_anthology_flags)
+model_loader.register("mpnet_embeddings", _load_mpnet_embeddings, warmup=_touch_pages)
 
-start = time.time()
-book_to_indices = defaultdict(list)
-for i, m in enumerate(metadata):
-    book_to_indices[m["book"]].append(i)
-log_stage("Book preview index map built", start)
 
-print("================================")
-print("System ready.")
-print("================================")
+def get_reader():
+    return model_loader.get("ocr")
 
-# MAIN SEARCH
-def run_image_search(image_path: str):
-    pipeline_start = time.time()
 
-    raw = extract_text(image_path)
+def get_minilm():
+    return model_loader.get("minilm")
+
+
+def get_mpnet():
+    return model_loader.get("mpnet")
+
+
+def get_faiss_index():
+    return model_loader.get("faiss_index")
+
+
+def get_metadata():
+    return model_loader.get("metadata")
+
+
+def get_mpnet_embeddings():
+    return model_loader.get("mpnet_embeddings")
+
+
+def get_anthology_flags():
+    return model_loader.get("anthology_flags")
+
+
+# Chunks from concurrent searches share forward passes (see batching.py).
+minilm_batcher = MicroBatcher(
+    "minilm", lambda texts: get_minilm().encode(texts, batch_size=MAX_BATCH_SIZE)
+)
+mpnet_batcher = MicroBatcher(
+    "mpnet", lambda texts: get_mpnet().encode(texts, batch_size=MAX_BATCH_SIZE)
+)
+
+
+# CASCADE
+_cascade_lock = threading.Lock()
+_cascade = {
+    "requests": 0,
+    "fingerprint_success": 0,
+    "fingerprint_low_confidence": 0,
+    "fingerprint_fail": 0,
+    "fingerprint_errors": 0,
+    "fingerprint_ms_total": 0.0,
+    "neural_runs": 0,
+    "neural_success": 0,
+    "neural_ms_total": 0.0,
+}
+
+
+def _count(**deltas):
+    with _cascade_lock:
+        for key, value in deltas.items():
+            _cascade[key] += value
+
+
+def cascade_stats():
+    with _cascade_lock:
+        stats = dict(_cascade)
+
+    tried = (
+        stats["fingerprint_success"]
+        + stats["fingerprint_low_confidence"]
+        + stats["fingerprint_fail"]
+        + stats["fingerprint_errors"]
+    )
+    stats["fingerprint_hit_rate"] = round(stats["fingerprint_success"] / tried, 3) if tried else None
+    stats["neural_avoided"] = stats["fingerprint_success"]
+    stats["fingerprint_ms_avg"] = round(stats.pop("fingerprint_ms_total") / tried, 1) if tried else None
+    neural_ms = stats.pop("neural_ms_total")
+    stats["neural_ms_avg"] = round(neural_ms / stats["neural_runs"], 1) if stats["neural_runs"] else None
+    return stats
+
+
+def fingerprint_response(result):
+    """
+    Image-search response for a fingerprint "success", else None.
+    """
+    if result["status"] != "success":
+        return None
+
+    return {
+        "status": "success",
+        "book": f"{result['book_id']}.txt",
+        "title": result["title"],
+        "author": result["author"],
+        "confidence": result["dominance"],
+        "votes": result["aligned"],
+        "stage": "fingerprint",
+    }
+
+
+def fingerprint_stage(raw):
+    """
+    Image-search response from the exact fingerprint matcher, or None when
+    it isn't confident and the neural path should run.
+    """
+    start = time.time()
+
+    try:
+        result = run_text_search(raw)
+    except Exception as e:
+        print("Fingerprint stage failed, using neural search:", e)
+        _count(fingerprint_errors=1, fingerprint_ms_total=(time.time() - start) * 1000)
+        return None
+
+    status = result["status"]
+    _count(**{f"fingerprint_{status}": 1, "fingerprint_ms_total": (time.time() - start) * 1000})
+    log_stage(f"Fingerprint stage: {status}", start)
+
+    return fingerprint_response(result)
+
+
+def fingerprint_stage_many(raws):
+    """
+    fingerprint_stage for several pages with one shared fingerprint lookup.
+    """
+    start = time.time()
+
+    try:
+        results = run_text_search_batch(raws)
+    except Exception as e:
+        print("Fingerprint stage failed, using neural search:", e)
+        _count(fingerprint_errors=len(raws), fingerprint_ms_total=(time.time() - start) * 1000)
+        return [None] * len(raws)
+
+    statuses = Counter(f"fingerprint_{r['status']}" for r in results)
+    _count(**statuses, fingerprint_ms_total=(time.time() - start) * 1000)
+    log_stage(f"Fingerprint stage ({len(raws)} items): {dict(statuses)}", start)
+
+    return [fingerprint_response(r) for r in results]
+
+
+def read_page(image_path, ocr_mode=DEFAULT_OCR_MODE):
+    """
+    (raw OCR text, cleaned text, None), or (None, None, fail response) when
+    the photo has too little usable English text.
+    """
+    raw = extract_text(image_path, ocr_mode)
     if not raw.strip():
-        return {"status": "fail", "reason": "No readable text detected"}
+        return None, None, {"status": "fail", "reason": "No readable text detected"}
     if not is_mostly_english(raw):
-        return {"status": "fail", "reason": "Only English books supported"}
+        return None, None, {"status": "fail", "reason": "Only English books supported"}
 
     clean = clean_text(raw)
     if len(clean.split()) < 10:
-        return {"status": "fail", "reason": "Too little readable text"}
+        return None, None, {"status": "fail", "reason": "Too little readable text"}
     if len(clean) < 80:
-        return {"status": "fail", "reason": "Not enough readable text"}
+        return None, None, {"status": "fail", "reason": "Not enough readable text"}
 
-    chunks = chunk_text(clean)
-
-    candidates = fast_search(chunks)
-    if not candidates:
-        return {"status": "fail", "reason": "No matches found"}
+    return raw, clean, None
 
-    best_book, best_score = rerank_candidates(chunks, candidates)
 
+def neural_response(clean, candidates, best_book, best_score):
+    """
+    Final answer of the neural path from the FAISS votes and the MPNet
+    rerank score.
+    """
     votes = Counter(candidates)
     top_vote_book, top_vote_count = votes.most_common(1)[0]
 
@@ -284,18 +511,53 @@ def run_image_search(image_path: str):
 
     if best_score >= CONFIDENCE_THRESHOLD or top_vote_count >= MIN_VOTE_ACCEPT:
         author = get_author_from_db(FINAL_BOOK)
-        log_stage("Total search pipeline", pipeline_start)
         return {
             "status": "success",
             "book": FINAL_BOOK,
             "author": author,
             "confidence": best_score,
             "votes": top_vote_count,
+            "stage": "neural",
         }
 
-    log_stage("Total search pipeline", pipeline_start)
     return {"status": "fail", "reason": "Low confidence"}
 
+
+# MAIN SEARCH
+def run_image_search(image_path: str, ocr_mode: str = DEFAULT_OCR_MODE, cascade: bool = CASCADE):
+    pipeline_start = time.time()
+    _count(requests=1)
+
+    raw, clean, failure = read_page(image_path, ocr_mode)
+    if failure:
+        return failure
+
+    if cascade:
+        result = fingerprint_stage(raw)
+        if result is not None:
+            log_stage("Total search pipeline", pipeline_start)
+            return result
+
+    neural_start = time.time()
+    _count(neural_runs=1)
+
+    chunks = chunk_text(clean)
+
+    candidates = fast_search(chunks)
+    if not candidates:
+        _count(neural_ms_total=(time.time() - neural_start) * 1000)
+        return {"status": "fail", "reason": "No matches found"}
+
+    best_book, best_score = rerank_candidates(chunks, candidates)
+    result = neural_response(clean, candidates, best_book, best_score)
+
+    _count(
+        neural_ms_total=(time.time() - neural_start) * 1000,
+        neural_success=int(result["status"] == "success"),
+    )
+    log_stage("Total search pipeline", pipeline_start)
+    return result
+
     pipeline_start = time.time()
 
     raw = extract_text(image_path)
@@ -354,6 +616,76 @@ def run_image_search(image_path: str):
     return {"status": "fail", "reason": "Low confidence"}
 
 
+def run_image_search_batch(image_paths, ocr_mode: str = DEFAULT_OCR_MODE, cascade: bool = CASCADE):
+    """
+    run_image_search for many photos. Returns one response per path, in
+    order; a photo that can't be read gets an "error" response instead of
+    failing the batch.
+
+    OCR still runs photo by photo, but the fingerprint stage answers every
+    page with one shared lookup and the remaining pages go through one
+    MiniLM pass, one FAISS search and one MPNet pass together.
+    """
+    pipeline_start = time.time()
+    _count(requests=len(image_paths))
+
+    responses = [None] * len(image_paths)
+    pages = []
+
+    for i, image_path in enumerate(image_paths):
+        try:
+            raw, clean, failure = read_page(image_path, ocr_mode)
+        except Exception as e:
+            print(f"OCR failed for {image_path}:", e)
+            failure = {"status": "error", "reason": "Could not read image"}
+
+        if failure:
+            responses[i] = failure
+        else:
+            pages.append((i, raw, clean))
+
+    if cascade and pages:
+        results = fingerprint_stage_many([raw for _, raw, _ in pages])
+        for (i, _, _), result in zip(pages, results):
+            responses[i] = result
+        pages = [page for page in pages if responses[page[0]] is None]
+
+    if pages:
+        neural_start = time.time()
+        _count(neural_runs=len(pages))
+
+        chunk_lists = [chunk_text(clean) for _, _, clean in pages]
+        candidate_lists = fast_search_many(chunk_lists)
+
+        rerank_chunks = [
+            chunk
+            for chunks, candidates in zip(chunk_lists, candidate_lists) if candidates
+            for chunk in chunks
+        ]
+        if rerank_chunks:
+            emb = embedding_cache.encode("mpnet", rerank_chunks, mpnet_batcher.encode)
+
+        end = 0
+        for (i, _, clean), chunks, candidates in zip(pages, chunk_lists, candidate_lists):
+            if not candidates:
+                responses[i] = {"status": "fail", "reason": "No matches found"}
+                continue
+
+            emb_query = emb[end:end + len(chunks)]
+            end += len(chunks)
+
+            best_book, best_score = rerank_candidates(chunks, candidates, emb_query)
+            responses[i] = neural_response(clean, candidates, best_book, best_score)
+
+        _count(
+            neural_ms_total=(time.time() - neural_start) * 1000,
+            neural_success=sum(responses[i]["status"] == "success" for i, _, _ in pages),
+        )
+
+    log_stage(f"Total batch search pipeline ({len(image_paths)} items)", pipeline_start)
+    return responses
+
+
 # CLI
 
 if __name__ == "__main__":
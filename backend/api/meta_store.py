@@ -0,0 +1,320 @@
+import json
+import os
+import numpy as np
+
+
+# Columnar replacement for books_meta.npy (an object array of
+# {"book", "preview"} dicts that has to be unpickled row by row).
+#
+#   book_of_row.npy       int32   book number of every FAISS row
+#   book_names.npy        <U      book number -> filename
+#   book_offsets.npy      int64   CSR: rows of book b are
+#   book_rows.npy         int64        book_rows[book_offsets[b]:book_offsets[b + 1]]
+#   preview_offsets.npy   int64   byte range of each row's preview in
+#   previews.bin          utf-8        previews.bin, read only when asked for
+#   row_removed.npy       bool    optional tombstones per row
+#   manifest.json
+#
+# Rows can be appended and books tombstoned in place (ingest_book.py). The
+# book -> rows lists only cover live rows; compact_meta_store() drops the
+# tombstoned ones and renumbers the rest.
+#
+# Nothing here is pickled, and loading costs a few array reads regardless of
+# the row count.
+
+FORMAT_VERSION = 1
+
+BOOK_OF_ROW_FILE = "book_of_row.npy"
+BOOK_NAMES_FILE = "book_names.npy"
+BOOK_OFFSETS_FILE = "book_offsets.npy"
+BOOK_ROWS_FILE = "book_rows.npy"
+PREVIEW_OFFSETS_FILE = "preview_offsets.npy"
+PREVIEWS_FILE = "previews.bin"
+REMOVED_FILE = "row_removed.npy"
+MANIFEST_FILE = "manifest.json"
+
+
+def _save(out_dir, name, arr):
+    path = os.path.join(out_dir, name)
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, arr)
+    os.replace(tmp_path, path)
+
+
+def write_meta_store(books, previews, out_dir):
+    """
+    Write the store for parallel per-row sequences of book filenames and
+    preview strings. Returns (rows, books).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    book_names, book_of_row = np.unique(np.asarray(books, dtype=str), return_inverse=True)
+    book_of_row = book_of_row.astype(np.int32)
+
+    book_rows, book_offsets = _book_csr(book_of_row, len(book_names))
+
+    encoded = [p.encode("utf-8") for p in previews]
+    preview_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in encoded], out=preview_offsets[1:])
+
+    if len(encoded) != len(book_of_row):
+        raise ValueError("books and previews must have the same length")
+
+    tmp_path = os.path.join(out_dir, PREVIEWS_FILE + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(encoded))
+    os.replace(tmp_path, os.path.join(out_dir, PREVIEWS_FILE))
+
+    _save(out_dir, BOOK_OF_ROW_FILE, book_of_row)
+    _save(out_dir, BOOK_NAMES_FILE, book_names)
+    _save(out_dir, BOOK_OFFSETS_FILE, book_offsets)
+    _save(out_dir, BOOK_ROWS_FILE, book_rows)
+    _save(out_dir, PREVIEW_OFFSETS_FILE, preview_offsets)
+
+    if os.path.exists(os.path.join(out_dir, REMOVED_FILE)):
+        os.remove(os.path.join(out_dir, REMOVED_FILE))
+
+    # Written last: a directory with a manifest is a complete store.
+    _write_manifest(out_dir, len(book_of_row), len(book_names))
+
+    return len(book_of_row), len(book_names)
+
+
+def _book_csr(book_of_row, n_books, removed=None):
+    rows = np.arange(len(book_of_row)) if removed is None else np.flatnonzero(~removed)
+    books = book_of_row[rows]
+
+    book_rows = rows[np.argsort(books, kind="stable")].astype(np.int64)
+    book_offsets = np.zeros(n_books + 1, dtype=np.int64)
+    np.cumsum(np.bincount(books, minlength=n_books), out=book_offsets[1:])
+    return book_rows, book_offsets
+
+
+def _write_manifest(out_dir, rows, books):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({
+            "format_version": FORMAT_VERSION,
+            "rows": rows,
+            "books": books,
+        }, f)
+    os.replace(path + ".tmp", path)
+
+
+def append_meta_rows(out_dir, books, previews):
+    """
+    Append rows to an existing store. Only the new previews are written to
+    previews.bin; the per-row and per-book arrays are rewritten. Returns
+    the first new row.
+    """
+    if len(books) != len(previews):
+        raise ValueError("books and previews must have the same length")
+
+    store = MetaStore(out_dir)
+    first_row = len(store)
+
+    book_names = store.book_names.tolist()
+    book_index = dict(store.book_index)
+    new_rows = []
+    for name in books:
+        if name not in book_index:
+            book_index[name] = len(book_names)
+            book_names.append(name)
+        new_rows.append(book_index[name])
+
+    book_of_row = np.concatenate([store.book_of_row, np.asarray(new_rows, dtype=np.int32)])
+    removed = np.concatenate([store.removed_rows(), np.zeros(len(new_rows), dtype=bool)])
+    book_rows, book_offsets = _book_csr(book_of_row, len(book_names), removed)
+
+    encoded = [p.encode("utf-8") for p in previews]
+    store._load_previews()
+    preview_offsets = np.concatenate([
+        store._preview_offsets,
+        store._preview_offsets[-1] + np.cumsum([len(p) for p in encoded], dtype=np.int64),
+    ])
+
+    # Readers map previews.bin up to the offsets they loaded, so appending in
+    # place is safe; the offsets and the manifest follow.
+    with open(os.path.join(out_dir, PREVIEWS_FILE), "r+b") as f:
+        f.seek(int(store._preview_offsets[-1]))
+        f.write(b"".join(encoded))
+
+    _save(out_dir, BOOK_OF_ROW_FILE, book_of_row)
+    _save(out_dir, BOOK_NAMES_FILE, np.asarray(book_names, dtype=str))
+    _save(out_dir, BOOK_OFFSETS_FILE, book_offsets)
+    _save(out_dir, BOOK_ROWS_FILE, book_rows)
+    _save(out_dir, PREVIEW_OFFSETS_FILE, preview_offsets)
+    _save(out_dir, REMOVED_FILE, removed)
+
+    _write_manifest(out_dir, len(book_of_row), len(book_names))
+
+    return first_row
+
+
+def remove_books(out_dir, names):
+    """
+    Tombstone the rows of books given by filename. They stay in place (and
+    in the FAISS index and MPNet store) until compact_meta_store(), but no
+    longer appear in rows_of_book() or live(). Returns the removed rows.
+    """
+    store = MetaStore(out_dir)
+
+    unknown = [name for name in names if not len(store.rows_of_book(name))]
+    if unknown:
+        raise KeyError(f"Not in the index: {', '.join(unknown)}")
+
+    rows = np.concatenate([store.rows_of_book(name) for name in names])
+    removed = store.removed_rows().copy()
+    removed[rows] = True
+
+    book_rows, book_offsets = _book_csr(store.book_of_row, len(store.book_names), removed)
+
+    _save(out_dir, BOOK_OFFSETS_FILE, book_offsets)
+    _save(out_dir, BOOK_ROWS_FILE, book_rows)
+    _save(out_dir, REMOVED_FILE, removed)
+
+    return rows
+
+
+def compact_meta_store(path, out_dir=None):
+    """
+    Write the store at `path` without tombstoned rows to `out_dir`, by
+    default rewriting it in place. Returns new_rows, the new row number of
+    every old row (-1 where dropped).
+    """
+    store = MetaStore(path)
+    kept = np.flatnonzero(~store.removed_rows())
+
+    write_meta_store(
+        store.books(kept).tolist(),
+        [store.preview(int(row)) for row in kept],
+        out_dir or path,
+    )
+
+    new_rows = np.full(len(store), -1, dtype=np.int64)
+    new_rows[kept] = np.arange(len(kept))
+    return new_rows
+
+
+def convert_legacy_meta(meta_path, out_dir):
+    """
+    One-off conversion of a books_meta.npy object array.
+    """
+    metadata = np.load(meta_path, allow_pickle=True)
+    return write_meta_store(
+        [m["book"] for m in metadata],
+        [m["preview"] for m in metadata],
+        out_dir,
+    )
+
+
+def is_meta_store(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+class MetaStore:
+    """
+    Read-only view of a store written by write_meta_store().
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported metadata format {manifest.get('format_version')} in {path}"
+            )
+
+        self.path = path
+        self.book_of_row = np.load(os.path.join(path, BOOK_OF_ROW_FILE))
+        self.book_names = np.load(os.path.join(path, BOOK_NAMES_FILE))
+        self.book_offsets = np.load(os.path.join(path, BOOK_OFFSETS_FILE))
+        self.book_rows = np.load(os.path.join(path, BOOK_ROWS_FILE), mmap_mode="r")
+        self.book_index = {name: i for i, name in enumerate(self.book_names.tolist())}
+
+        removed_path = os.path.join(path, REMOVED_FILE)
+        self.row_removed = np.load(removed_path) if os.path.exists(removed_path) else None
+
+        self._preview_offsets = None
+        self._previews = None
+
+        if len(self.book_of_row) != manifest["rows"]:
+            raise ValueError(f"{path} does not match its manifest")
+
+    def __len__(self):
+        return len(self.book_of_row)
+
+    def __getitem__(self, row):
+        # Same shape as a books_meta.npy entry.
+        return {"book": self.book(row), "preview": self.preview(row)}
+
+    def book(self, row):
+        return str(self.book_names[self.book_of_row[row]])
+
+    def books(self, rows):
+        """
+        Filenames for an array of rows.
+        """
+        return self.book_names[self.book_of_row[np.asarray(rows)]]
+
+    def removed_rows(self):
+        """
+        Tombstone flag per row.
+        """
+        if self.row_removed is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.row_removed
+
+    def live(self, rows):
+        """
+        `rows` without tombstoned ones.
+        """
+        if self.row_removed is None:
+            return rows
+        return rows[~self.row_removed[rows]]
+
+    def rows_of_book(self, name):
+        """
+        Live rows of book `name` in ascending order (empty if unknown).
+        """
+        b = self.book_index.get(name)
+        if b is None:
+            return self.book_rows[:0]
+        return self.book_rows[self.book_offsets[b]:self.book_offsets[b + 1]]
+
+    def rows_of_books(self, books, limit=None):
+        """
+        Concatenated rows of several book numbers, at most `limit` per book.
+        Returns (rows, counts) with counts[i] rows belonging to books[i].
+        """
+        books = np.asarray(books, dtype=np.int64)
+        starts = self.book_offsets[books]
+        counts = self.book_offsets[books + 1] - starts
+        if limit is not None:
+            counts = np.minimum(counts, limit)
+
+        # starts[i], starts[i] + 1, ... for counts[i] entries, per book
+        seg_starts = np.cumsum(counts) - counts
+        within = np.arange(counts.sum()) - np.repeat(seg_starts, counts)
+        rows = self.book_rows[np.repeat(starts, counts) + within]
+
+        return rows, counts
+
+    def _load_previews(self):
+        if self._previews is None:
+            self._preview_offsets = np.load(os.path.join(self.path, PREVIEW_OFFSETS_FILE))
+            blob_path = os.path.join(self.path, PREVIEWS_FILE)
+            if os.path.getsize(blob_path):
+                self._previews = np.memmap(blob_path, dtype=np.uint8, mode="r")
+            else:
+                self._previews = np.empty(0, dtype=np.uint8)
+
+    def preview(self, row):
+        self._load_previews()
+        start, end = self._preview_offsets[row], self._preview_offsets[row + 1]
+        return self._previews[start:end].tobytes().decode("utf-8")
+
+    def iter_previews(self):
+        for row in range(len(self)):
+            yield self.preview(row)
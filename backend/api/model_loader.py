@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+
+# Lazy registry for the heavy pieces of the search pipelines (OCR reader,
+# encoders, FAISS index, embedding caches...).
+#
+# Nothing is loaded at import time. A component is built on first get(), or
+# ahead of traffic by preload()/warmup() for the names a worker is configured
+# with:
+#
+#   LEAFLENS_COMPONENTS=text           fingerprint search only
+#   LEAFLENS_COMPONENTS=image          OCR + neural search only
+#   LEAFLENS_COMPONENTS=all            everything (default)
+#   LEAFLENS_COMPONENTS=ocr,minilm     any mix of groups and component names
+#   LEAFLENS_WARMUP=0                  skip the warmup pass
+
+COMPONENT_GROUPS = {
+    "text": ["text_db", "postings"],
+    "image": [
+        "ocr",
+        "minilm",
+        "mpnet",
+        "faiss_index",
+        "metadata",
+        "anthology_flags",
+        "mpnet_embeddings",
+    ],
+}
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Component:
+    def __init__(self, name, loader, warmup=None):
+        self.name = name
+        self.loader = loader
+        self.warmup_fn = warmup
+        self.lock = threading.Lock()
+        self.value = None
+        self.state = NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+
+    def get(self):
+        if self.state == READY:
+            return self.value
+
+        with self.lock:
+            if self.state != READY:
+                self.state = LOADING
+                start = time.time()
+                try:
+                    self.value = self.loader()
+                except Exception as e:
+                    self.state = FAILED
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.time() - start
+                self.error = None
+                self.state = READY
+                print(
+                    f"[{datetime.now().strftime('%H:%M:%S')}] "
+                    f"Loaded component: {self.name} | {self.load_seconds:.2f}s"
+                )
+
+        return self.value
+
+    def warmup(self):
+        value = self.get()
+        if self.warmup_fn is None:
+            return
+
+        start = time.time()
+        self.warmup_fn(value)
+        self.warmup_seconds = time.time() - start
+
+    def status(self):
+        return {
+            "state": self.state,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+_registry = {}
+
+
+def register(name, loader, warmup=None):
+    _registry[name] = Component(name, loader, warmup)
+
+
+def get(name):
+    return _registry[name].get()
+
+
+def configured_components():
+    """
+    Component names selected by LEAFLENS_COMPONENTS, in registration order.
+    """
+    wanted = set()
+
+    for part in os.environ.get("LEAFLENS_COMPONENTS", "all").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part == "all":
+            wanted.update(_registry)
+        elif part in COMPONENT_GROUPS:
+            wanted.update(COMPONENT_GROUPS[part])
+        else:
+            wanted.add(part)
+
+    return [name for name in _registry if name in wanted]
+
+
+def preload(names, warmup=True):
+    """
+    Load (and optionally warm up) `names`. A failure is recorded on the
+    component and does not stop the others.
+    """
+    for name in names:
+        try:
+            if warmup:
+                _registry[name].warmup()
+            else:
+                _registry[name].get()
+        except Exception as e:
+            print(f"Component {name} failed to load: {e}")
+
+
+def warmup_enabled():
+    return os.environ.get("LEAFLENS_WARMUP", "1") != "0"
+
+
+def readiness(names):
+    components = {name: _registry[name].status() for name in _registry}
+    ready = all(_registry[name].state == READY for name in names)
+
+    return {
+        "status": "ready" if ready else "not_ready",
+        "required": names,
+        "components": components,
+    }
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+# OCR results keyed on image content, so a retried or re-shared page photo
+# skips EasyOCR.
+#
+# The exact key is a SHA-256 of the decoded pixels (the file's container and
+# metadata don't matter). Optionally, a 64-bit difference hash (dHash) also
+# catches copies that were re-encoded or lightly resized: within the memory
+# tier any entry within `phash_max_distance` bits matches, on disk the dHash
+# must be equal; either way only among entries of the same variant (OCR
+# mode). dHash only sees coarse layout, so two different pages shot
+# the same way can collide; it is off unless a distance is given.
+#
+# Tiers: an LRU dict in memory, then an optional SQLite file bounded by the
+# total size of the stored text (least recently used rows are evicted).
+
+MEMORY_ENTRIES = 256
+DISK_MAX_BYTES = 64 * 1024 * 1024
+
+# Bump when OCR settings change so old results aren't served.
+KEY_VERSION = 1
+
+
+def content_hash(img, variant=""):
+    h = hashlib.sha256()
+    h.update(f"{KEY_VERSION}:{variant}:{img.shape}:{img.dtype}".encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+def dhash(img):
+    """
+    64-bit difference hash of a BGR or grayscale image, as a signed int64.
+    """
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">i8")[0])
+
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+class OCRCache:
+    def __init__(
+        self,
+        disk_path=None,
+        memory_entries=MEMORY_ENTRIES,
+        disk_max_bytes=DISK_MAX_BYTES,
+        phash_max_distance=None,
+    ):
+        self.disk_path = disk_path
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.phash_max_distance = phash_max_distance
+
+        self._memory = OrderedDict()  # key -> (phash, variant, text)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {
+            "memory_hits": 0,
+            "phash_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "disk_evictions": 0,
+            "disk_errors": 0,
+        }
+
+    def keys(self, img, variant=""):
+        """
+        Cache keys for a decoded image. `variant` separates results produced
+        with different OCR settings for the same pixels.
+        """
+        return content_hash(img, variant), dhash(img), variant
+
+    def _disk(self):
+        if self._conn is None and self.disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.disk_path)), exist_ok=True)
+            conn = sqlite3.connect(self.disk_path, check_same_thread=False)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    key TEXT PRIMARY KEY,
+                    phash INTEGER NOT NULL,
+                    variant TEXT,
+                    text TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(ocr_cache)")]
+            if "variant" not in columns:
+                # Files from before variants were stored: their rows can
+                # still hit by exact key, never by dHash.
+                conn.execute("ALTER TABLE ocr_cache ADD COLUMN variant TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_phash ON ocr_cache(phash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_used ON ocr_cache(last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, phash, variant, text):
+        self._memory[key] = (phash, variant, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, keys):
+        """
+        Cached text for `keys` (from keys()), or None.
+        """
+        key, phash, variant = keys
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return self._memory[key][2]
+
+            for other_phash, other_variant, text in reversed(self._memory.values()):
+                if self.phash_max_distance is None:
+                    break
+                if other_variant == variant and hamming(phash, other_phash) <= self.phash_max_distance:
+                    self._stats["phash_hits"] += 1
+                    self._remember(key, phash, variant, text)
+                    return text
+
+            try:
+                conn = self._disk()
+                if conn is None:
+                    row = None
+                elif self.phash_max_distance is None:
+                    row = conn.execute(
+                        "SELECT key, text FROM ocr_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                else:
+                    row = conn.execute(
+                        "SELECT key, text FROM ocr_cache WHERE key = ? OR (phash = ? AND variant = ?) "
+                        "ORDER BY key = ? DESC LIMIT 1",
+                        (key, phash, variant, key),
+                    ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE ocr_cache SET last_used = ? WHERE key = ?", (time.time(), row[0])
+                    )
+                    conn.commit()
+            except sqlite3.Error as e:
+                print("OCR cache disk read failed:", e)
+                self._stats["disk_errors"] += 1
+                row = None
+
+            if row:
+                self._stats["disk_hits"] += 1
+                self._remember(key, phash, variant, row[1])
+                return row[1]
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, keys, text):
+        key, phash, variant = keys
+
+        with self._lock:
+            self._remember(key, phash, variant, text)
+            self._stats["stores"] += 1
+
+            try:
+                conn = self._disk()
+                if conn is None:
+                    return
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO ocr_cache (key, phash, variant, text, size, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, phash, variant, text, len(text.encode("utf-8")), time.time()),
+                )
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                print("OCR cache disk write failed:", e)
+                self._stats["disk_errors"] += 1
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+
+        over = total - self.disk_max_bytes
+        rows = conn.execute("SELECT key, size FROM ocr_cache ORDER BY last_used")
+
+        doomed = []
+        for key, size in rows:
+            if over <= 0:
+                break
+            doomed.append((key,))
+            over -= size
+
+        conn.executemany("DELETE FROM ocr_cache WHERE key = ?", doomed)
+        self._stats["disk_evictions"] += len(doomed)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+
+        hits = stats["memory_hits"] + stats["phash_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 3) if lookups else None
+        stats["disk_path"] = self.disk_path
+        return stats
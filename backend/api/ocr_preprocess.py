@@ -0,0 +1,221 @@
+import cv2
+import numpy as np
+
+
+# Image preparation before EasyOCR, in three latency/quality modes.
+#
+#   grayscale        EasyOCR converts to gray internally anyway; doing it first
+#                    makes every later step a third of the work
+#   crop             keep the bounding box of the text blocks (drops table,
+#                    fingers, background around the page)
+#   deskew           rotate by the dominant text-line angle
+#   glyph_px         rescale so the median character height lands near this
+#                    many pixels instead of blindly capping the long side;
+#                    EasyOCR's detector is tuned for roughly 20-40 px glyphs
+#
+# max_dim / min_dim bound the final long side whatever the glyph estimate.
+# Photos far above max_dim are shrunk to PRESHRINK x max_dim up front, which
+# keeps the analysis cheap and only discards detail the final resize would.
+#
+# "legacy" is the preprocessing from before these modes: the BGR photo with
+# its long side capped at 1200 px, nothing else.
+
+MODES = {
+    "legacy": {
+        "grayscale": False,
+        "crop": False,
+        "deskew": False,
+        "glyph_px": None,
+        "max_dim": 1200,
+        "min_dim": 0,
+        "interpolation": cv2.INTER_LINEAR,
+    },
+    "fast": {
+        "grayscale": True,
+        "crop": True,
+        "deskew": False,
+        "glyph_px": 20,
+        "max_dim": 1000,
+        "min_dim": 480,
+    },
+    "balanced": {
+        "grayscale": True,
+        "crop": True,
+        "deskew": False,
+        "glyph_px": 28,
+        "max_dim": 1600,
+        "min_dim": 640,
+    },
+    "accurate": {
+        "grayscale": True,
+        "crop": True,
+        "deskew": True,
+        "glyph_px": 36,
+        "max_dim": 2400,
+        "min_dim": 800,
+    },
+}
+DEFAULT_MODE = "balanced"
+
+MAX_DESKEW_DEGREES = 15
+MIN_DESKEW_DEGREES = 0.3
+CROP_PADDING = 0.02
+PRESHRINK = 1.5
+
+
+def to_gray(img):
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def text_mask(gray):
+    """
+    Binary mask (255 = ink) of dark text on a lighter page.
+    """
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+
+def glyph_components(mask):
+    """
+    Heights of connected components that look like characters.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    h_img = mask.shape[0]
+
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+
+    keep = (
+        (heights >= 4)
+        & (heights <= h_img / 8)
+        & (areas >= 8)
+        & (widths <= heights * 4)
+    )
+    return heights[keep]
+
+
+def estimate_glyph_height(mask):
+    heights = glyph_components(mask)
+    if len(heights) < 20:
+        return None
+    return float(np.median(heights))
+
+
+def text_bbox(mask):
+    """
+    (x0, y0, x1, y1) around the text blocks, or None.
+    """
+    h, w = mask.shape
+    # Merge letters into words and words into lines, then lines into blocks.
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(w // 60, 3), max(h // 120, 3)))
+    blocks = cv2.dilate(cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8)), kernel)
+
+    contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = [cv2.boundingRect(c) for c in contours]
+    boxes = [b for b in boxes if b[2] * b[3] >= 0.002 * w * h]
+    if not boxes:
+        return None
+
+    x0 = min(b[0] for b in boxes)
+    y0 = min(b[1] for b in boxes)
+    x1 = max(b[0] + b[2] for b in boxes)
+    y1 = max(b[1] + b[3] for b in boxes)
+
+    pad_x, pad_y = int(w * CROP_PADDING), int(h * CROP_PADDING)
+    return max(x0 - pad_x, 0), max(y0 - pad_y, 0), min(x1 + pad_x, w), min(y1 + pad_y, h)
+
+
+def estimate_skew(mask):
+    """
+    Text-line angle in degrees (positive = counter-clockwise), or 0.
+    """
+    h, w = mask.shape
+    # Smear characters horizontally into line blobs; their min-area rects
+    # carry the line angle.
+    lines = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (max(w // 40, 5), 1)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    angles, weights = [], []
+    for c in contours:
+        (_, _), (rw, rh), angle = cv2.minAreaRect(c)
+        if rw < rh:
+            rw, rh = rh, rw
+            angle -= 90
+        if rw < w / 10 or rw < rh * 5:
+            continue
+        angle = (angle + 90) % 180 - 90
+        if abs(angle) <= MAX_DESKEW_DEGREES:
+            angles.append(angle)
+            weights.append(rw)
+
+    if len(angles) < 3:
+        return 0.0
+
+    order = np.argsort(angles)
+    cum = np.cumsum(np.asarray(weights)[order])
+    # weighted median
+    return -float(np.asarray(angles)[order][np.searchsorted(cum, cum[-1] / 2)])
+
+
+def rotate(img, degrees):
+    h, w = img.shape[:2]
+    m = cv2.getRotationMatrix2D((w / 2, h / 2), degrees, 1.0)
+    return cv2.warpAffine(img, m, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def preprocess(img, mode=DEFAULT_MODE):
+    """
+    Prepare a decoded BGR image for OCR. Returns (image, info) where info
+    records what was done.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown OCR mode: {mode} (expected one of {', '.join(MODES)})")
+    cfg = MODES[mode]
+    info = {"mode": mode}
+
+    if cfg["grayscale"]:
+        img = to_gray(img)
+
+    analyse = cfg["crop"] or cfg["deskew"] or cfg["glyph_px"]
+
+    h, w = img.shape[:2]
+    if analyse and max(h, w) > cfg["max_dim"] * PRESHRINK:
+        f = cfg["max_dim"] * PRESHRINK / max(h, w)
+        img = cv2.resize(img, (int(w * f), int(h * f)), interpolation=cv2.INTER_AREA)
+
+    mask = text_mask(to_gray(img)) if analyse else None
+
+    if cfg["deskew"]:
+        angle = estimate_skew(mask)
+        if abs(angle) >= MIN_DESKEW_DEGREES:
+            img = rotate(img, -angle)
+            mask = rotate(mask, -angle)
+            info["deskew_degrees"] = round(angle, 2)
+
+    if cfg["crop"]:
+        bbox = text_bbox(mask)
+        if bbox is not None:
+            x0, y0, x1, y1 = bbox
+            img = img[y0:y1, x0:x1]
+            mask = mask[y0:y1, x0:x1]
+            info["crop"] = bbox
+
+    h, w = img.shape[:2]
+    long_side = max(h, w)
+
+    glyph = estimate_glyph_height(mask) if cfg["glyph_px"] else None
+    scale = cfg["glyph_px"] / glyph if glyph else 1.0
+
+    # Keep the long side within [min_dim, max_dim] whatever the estimate said.
+    scale = min(scale, cfg["max_dim"] / long_side)
+    scale = max(scale, min(cfg["min_dim"] / long_side, 1.0))
+
+    if abs(scale - 1.0) > 0.05 or long_side > cfg["max_dim"]:
+        interpolation = cfg.get("interpolation") or (cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+        img = cv2.resize(img, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=interpolation)
+        info["scale"] = round(scale, 3)
+
+    if glyph:
+        info["glyph_px"] = round(glyph, 1)
+
+    return img, info
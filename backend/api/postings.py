@@ -0,0 +1,227 @@
+import os
+import json
+import sqlite3
+import time
+import numpy as np
+
+from backend.api.fingerprint import FP_MD5, get_fingerprint_version, get_winnow_k
+from backend.api.schema import SCHEMA_V2, get_schema_version
+
+
+# Compiled, read-only posting lists for the fingerprint index.
+#
+# The directory holds one sorted int64 hash column and two parallel columns
+# (book index, word position). Every file is opened with mmap_mode="r", so all
+# gunicorn workers on a host share one page-cached copy instead of each
+# holding its own.
+#
+# Books removed after the build are listed in the manifest's
+# "removed_books" and skipped by lookups until the next build.
+
+FORMAT_VERSION = 1
+
+HASHES_FILE = "hashes.npy"
+BOOKS_FILE = "books.npy"
+POSITIONS_FILE = "positions.npy"
+MANIFEST_FILE = "manifest.json"
+
+FETCH_ROWS = 500_000
+
+
+def hex_hashes_to_int(hashes):
+    """
+    Convert 16-char hex fingerprints to signed 64-bit integers
+    (the same value SQLite stores for an INTEGER column).
+    """
+    return np.array([int(h, 16) for h in hashes], dtype=np.uint64).view(np.int64)
+
+
+def build_postings(db_path, out_dir, max_df=None):
+    """
+    Compile the `fingerprints` table of `db_path` into `out_dir`.
+
+    With `max_df`, hashes that occur in more than that many books are left
+    out of the compiled lists.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+
+    version = get_schema_version(c)
+    fingerprint_version = get_fingerprint_version(c)
+    winnow_k = get_winnow_k(c)
+
+    book_ids = [row[0] for row in c.execute("SELECT book_id FROM books ORDER BY book_id")]
+    book_index = {bid: i for i, bid in enumerate(book_ids)}
+
+    if version == SCHEMA_V2:
+        key_to_index = {
+            key: book_index[bid]
+            for key, bid in c.execute("SELECT book_key, book_id FROM books")
+        }
+        cur = c.execute("SELECT hash, book_key, position FROM fingerprints")
+    else:
+        cur = c.execute("SELECT hash, book_id, position FROM fingerprints")
+
+    total = conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    hashes = np.empty(total, dtype=np.int64)
+    books = np.empty(total, dtype=np.int32)
+    positions = np.empty(total, dtype=np.int32)
+
+    filled = 0
+
+    while True:
+        rows = cur.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+
+        h, b, p = zip(*rows)
+        end = filled + len(rows)
+
+        if version == SCHEMA_V2:
+            hashes[filled:end] = h
+            books[filled:end] = [key_to_index[key] for key in b]
+        else:
+            hashes[filled:end] = hex_hashes_to_int(h)
+            books[filled:end] = [book_index.setdefault(bid, len(book_index)) for bid in b]
+        positions[filled:end] = p
+        filled = end
+
+    conn.close()
+
+    # Fingerprints whose book is missing from `books` still get an index slot.
+    book_ids = sorted(book_index, key=book_index.get)
+
+    hashes, books, positions = hashes[:filled], books[:filled], positions[:filled]
+
+    if max_df:
+        order = np.lexsort((books, hashes))
+        h, b = hashes[order], books[order]
+
+        new_hash = np.r_[True, h[1:] != h[:-1]]
+        new_pair = new_hash | np.r_[True, b[1:] != b[:-1]]
+        group = np.cumsum(new_hash) - 1
+
+        df = np.bincount(group, weights=new_pair)
+        order = order[df[group] <= max_df]
+    else:
+        order = np.argsort(hashes, kind="stable")
+
+    columns = {
+        HASHES_FILE: hashes[order],
+        BOOKS_FILE: books[order],
+        POSITIONS_FILE: positions[order],
+    }
+
+    for name, arr in columns.items():
+        tmp_path = os.path.join(out_dir, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp_path, os.path.join(out_dir, name))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "rows": int(len(order)),
+        "max_df": max_df,
+        "fingerprint_version": fingerprint_version,
+        "winnow_k": winnow_k,
+        "book_ids": book_ids,
+        "source_db": os.path.abspath(db_path),
+        "built_at": time.time(),
+    }
+
+    tmp_path = os.path.join(out_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_FILE))
+
+    return manifest
+
+
+def remove_posting_books(path, book_ids):
+    """
+    Tombstone `book_ids` in a compiled posting directory. Returns how many
+    of them it holds.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    index = {book_id: i for i, book_id in enumerate(manifest["book_ids"])}
+    found = {index[book_id] for book_id in book_ids if book_id in index}
+    manifest["removed_books"] = sorted(set(manifest.get("removed_books", [])) | found)
+
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+    return len(found)
+
+
+def lookup_sorted(hashes, books, positions, query_hashes):
+    """
+    Find every posting for a batch of int64 hashes in hash-sorted columns.
+
+    Returns (query_idx, books, positions): for each hit, the index of the
+    query hash it matched plus the parallel book index and word position.
+    """
+    query_hashes = np.asarray(query_hashes, dtype=np.int64)
+
+    # Probing in sorted order keeps the binary searches on nearby pages.
+    order = np.argsort(query_hashes, kind="stable")
+    sorted_q = query_hashes[order]
+
+    lo = np.searchsorted(hashes, sorted_q, side="left")
+    hi = np.searchsorted(hashes, sorted_q, side="right")
+    counts = hi - lo
+
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.astype(np.int32), empty.astype(np.int32)
+
+    starts = np.cumsum(counts) - counts
+    rows = np.arange(total) - np.repeat(starts - lo, counts)
+
+    query_idx = np.repeat(order, counts)
+
+    return query_idx, books[rows], positions[rows]
+
+
+class PostingIndex:
+    """
+    Memory-mapped, read-only view of a compiled posting-list directory.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported postings format in {path}")
+
+        self.path = path
+        self.book_ids = manifest["book_ids"]
+        self.fingerprint_version = manifest.get("fingerprint_version", FP_MD5)
+        self.winnow_k = manifest.get("winnow_k", 1)
+        self.removed_books = np.array(manifest.get("removed_books", []), dtype=np.int64)
+        self.hashes = np.load(os.path.join(path, HASHES_FILE), mmap_mode="r")
+        self.books = np.load(os.path.join(path, BOOKS_FILE), mmap_mode="r")
+        self.positions = np.load(os.path.join(path, POSITIONS_FILE), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def lookup(self, query_hashes):
+        query_idx, books, positions = lookup_sorted(
+            self.hashes, self.books, self.positions, query_hashes
+        )
+
+        if len(self.removed_books):
+            keep = ~np.isin(books, self.removed_books)
+            return query_idx[keep], books[keep], positions[keep]
+
+        return query_idx, books, positions
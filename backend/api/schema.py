@@ -0,0 +1,192 @@
+import sqlite3
+
+
+# Fingerprint database layouts.
+#
+# v1: TEXT hex hashes and TEXT book ids in a rowid table, plus a separate
+#     idx_fingerprint_hash index.
+# v2: 64-bit INTEGER hashes and a small integer book key, clustered on
+#     (hash, book_key, position) in a WITHOUT ROWID table.
+
+SCHEMA_V1 = 1
+SCHEMA_V2 = 2
+
+LATEST_SCHEMA = SCHEMA_V2
+
+
+V1_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS books (
+        book_id TEXT PRIMARY KEY,
+        title TEXT,
+        author TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fingerprints (
+        hash TEXT,
+        book_id TEXT,
+        position INTEGER
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_fingerprint_hash
+    ON fingerprints(hash)
+    """,
+]
+
+V2_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS books (
+        book_key INTEGER PRIMARY KEY,
+        book_id TEXT NOT NULL UNIQUE,
+        title TEXT,
+        author TEXT,
+        indexed INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fingerprints (
+        hash INTEGER NOT NULL,
+        book_key INTEGER NOT NULL REFERENCES books(book_key),
+        position INTEGER NOT NULL,
+        PRIMARY KEY (hash, book_key, position)
+    ) WITHOUT ROWID
+    """,
+]
+
+META_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+)
+"""
+
+
+def hex_hash_to_int(h):
+    """
+    16-char hex fingerprint -> signed 64-bit integer, as SQLite stores it.
+    """
+    v = int(h, 16)
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+def int_hash_to_hex(v):
+    return format(v & 0xFFFFFFFFFFFFFFFF, "016x")
+
+
+def table_exists(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+        (name,),
+    ).fetchone()
+    return row is not None
+
+
+def get_meta(conn, key, default=None):
+    if not table_exists(conn, "schema_meta"):
+        return default
+
+    row = conn.execute(
+        "SELECT value FROM schema_meta WHERE key=?", (key,)
+    ).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(conn, key, value):
+    conn.execute(META_TABLE)
+    conn.execute(
+        "INSERT OR REPLACE INTO schema_meta (key, value) VALUES (?, ?)",
+        (key, str(value)),
+    )
+
+
+def get_schema_version(conn):
+    """
+    Databases built before schema_meta existed are v1.
+    """
+    return int(get_meta(conn, "schema_version", SCHEMA_V1))
+
+
+def ensure_schema(conn, version=LATEST_SCHEMA):
+    """
+    Create the tables for `version` in an empty database, or return the
+    version of the existing layout untouched.
+    """
+    if table_exists(conn, "fingerprints"):
+        return get_schema_version(conn)
+
+    for ddl in (V2_TABLES if version == SCHEMA_V2 else V1_TABLES):
+        conn.execute(ddl)
+
+    set_meta(conn, "schema_version", version)
+    conn.commit()
+
+    return version
+
+
+def migrate_v1_to_v2(conn):
+    """
+    Rewrite a v1 database into the v2 layout in place.
+    """
+    if get_schema_version(conn) != SCHEMA_V1:
+        raise ValueError("Database is not on schema v1")
+
+    conn.create_function("hex_to_i64", 1, hex_hash_to_int, deterministic=True)
+
+    conn.commit()
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # explicit BEGIN/COMMIT below
+
+    c = conn.cursor()
+    c.execute("BEGIN")
+
+    try:
+        c.execute("DROP INDEX IF EXISTS idx_fingerprint_hash")
+        c.execute("ALTER TABLE books RENAME TO books_v1")
+        c.execute("ALTER TABLE fingerprints RENAME TO fingerprints_v1")
+
+        for ddl in V2_TABLES:
+            c.execute(ddl)
+
+        c.execute("""
+            INSERT INTO books (book_id, title, author)
+            SELECT book_id, title, author FROM books_v1 ORDER BY book_id
+        """)
+
+        # Fingerprints whose book never made it into `books`.
+        c.execute("""
+            INSERT INTO books (book_id, title, author)
+            SELECT DISTINCT f.book_id, f.book_id, 'Unknown'
+            FROM fingerprints_v1 f
+            WHERE f.book_id NOT IN (SELECT book_id FROM books)
+        """)
+
+        # v2 has no index on the book column, so "already indexed" is a flag.
+        c.execute("""
+            UPDATE books SET indexed = 1
+            WHERE book_id IN (SELECT DISTINCT book_id FROM fingerprints_v1)
+        """)
+
+        # Inserting in key order keeps the clustered B-tree build sequential.
+        c.execute("""
+            INSERT OR IGNORE INTO fingerprints (hash, book_key, position)
+            SELECT hex_to_i64(f.hash), b.book_key, f.position
+            FROM fingerprints_v1 f
+            JOIN books b ON b.book_id = f.book_id
+            ORDER BY 1, 2, 3
+        """)
+
+        c.execute("DROP TABLE fingerprints_v1")
+        c.execute("DROP TABLE books_v1")
+
+        set_meta(conn, "schema_version", SCHEMA_V2)
+
+        c.execute("COMMIT")
+    except sqlite3.Error:
+        c.execute("ROLLBACK")
+        raise
+
+    c.execute("VACUUM")
+
+    conn.isolation_level = isolation_level
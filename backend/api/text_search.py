@@ -1,19 +1,50 @@
-import sqlite3
-import hashlib
+import os
 import re
-from collections import defaultdict, Counter
+import threading
+import numpy as np
+from collections import defaultdict
+
+from backend.api import model_loader
+from backend.api.db import get_pool
+from backend.api.doc_freq import load_stop_hashes
+from backend.api.fingerprint import (
+    fingerprint_windows,
+    get_fingerprint_version,
+    get_winnow_k,
+)
+from backend.api.postings import PostingIndex
+from backend.api.schema import SCHEMA_V2, get_schema_version, int_hash_to_hex
 
 
 DB_PATH = r"C:\Users\DELL\Desktop\LeafLens\books.db"
 print("Using DB at:", DB_PATH)
 
+# Compiled posting lists (see build_postings.py). When missing, lookups fall
+# back to SQLite.
+POSTINGS_DIR = r"C:\Users\DELL\Desktop\LeafLens\books_postings"
+
+# "batch" sends every query hash to SQLite in chunked IN lists and votes over
+# the single result set; "per_window" is the original one-SELECT-per-window
+# path.
+SQL_LOOKUP_MODE = "batch"
+SQL_BATCH_SIZE = 900  # stays under SQLITE_MAX_VARIABLE_NUMBER on old builds
+
+# Query windows whose hash occurs in more than this many books (per the
+# fingerprint_df table) are not looked up. None disables the filter.
+MAX_DOC_FREQ = 25
+
 WINDOW_SIZES = [6, 7, 8]
-STEP = 1
 
 BASE_MIN_ALIGNED = 8
 BASE_MIN_DOMINANCE = 0.6
 MIN_TOTAL_VOTES = 12
 
+# Progressive mode: first batch size (doubling after each round), and how
+# far past MIN_ALIGNED / ahead of the runner-up the leader must be to stop.
+PROGRESSIVE_FIRST_BATCH = 48
+PROGRESSIVE_MARGIN = 4
+PROGRESSIVE_LEAD = 3
+
 
 def is_mostly_english(text: str) -> bool:
     letters = re.findall(r"[a-zA-Z]", text)
@@ -27,115 +58,440 @@ def normalize_text(text):
     return text.strip()
 
 
-def fingerprint_query(text, window_size):
-    words = text.split()
-    for i in range(0, len(words) - window_size + 1, STEP):
-        window = " ".join(words[i:i + window_size])
-        h = hashlib.md5(window.encode("utf-8")).hexdigest()[:16]
-        yield h, i
+_postings = None
+
+
+def get_postings():
+    global _postings
 
+    if _postings is None and os.path.isdir(POSTINGS_DIR):
+        try:
+            _postings = PostingIndex(POSTINGS_DIR)
+            print(f"Using posting lists at: {POSTINGS_DIR} ({len(_postings)} rows)")
+        except (OSError, ValueError) as e:
+            print("Posting lists unavailable, using SQLite:", e)
 
-def run_text_search(query: str):
+    return _postings
+
+
+class TitleCatalog:
     """
-    Perform text-based book identification.
+    Snapshot of the `books` table as integer arrays.
+
+    Every book gets a dense index, every normalized title a title index, and
+    `title_of[book]` collapses editions that share a title. Books of one
+    title are listed in `title_books[title_starts[t]:title_starts[t + 1]]`,
+    in table order.
+
+    Fingerprinted books without a `books` row are appended on first sight
+    (see placeholders()).
     """
 
-    if not query or not query.strip():
-        return {"status": "fail", "reason": "Empty query"}
+    def __init__(self, rows):
+        self.book_ids = []
+        self.titles = []
+        self.authors = []
+        self.index = {}
+        self.key_index = {}
+        self.title_keys = []
+        self._lock = threading.Lock()
+        title_index = {}
+        title_of = []
+
+        for book_key, book_id, title, author in rows:
+            i = len(self.book_ids)
+            self.book_ids.append(book_id)
+            self.titles.append(title)
+            self.authors.append(author)
+            self.index[book_id] = i
+            if book_key is not None:
+                self.key_index[book_key] = i
+
+            title_key = normalize_text(title)
+            if title_key not in title_index:
+                title_index[title_key] = len(self.title_keys)
+                self.title_keys.append(title_key)
+            title_of.append(title_index[title_key])
+
+        self._set_titles(np.array(title_of, dtype=np.int64))
+
+    def _set_titles(self, title_of):
+        title_books = np.argsort(title_of, kind="stable")
+        title_starts = np.concatenate(
+            [[0], np.cumsum(np.bincount(title_of, minlength=len(self.title_keys)))]
+        )
+        self.title_of = title_of
+        self.title_books = title_books
+        self.title_starts = title_starts
+
+    def placeholders(self, missing):
+        """
+        Catalog indices for fingerprinted books that have no `books` row,
+        given as (book_key, book_id) pairs (book_key None on v1). Each is
+        added once, as its own title named after its id, the way the
+        original search reported them.
+
+        Books and titles are only appended, so the indices a concurrent
+        search already holds keep their meaning.
+        """
+        with self._lock:
+            indices = []
+            added = []
+
+            for book_key, book_id in missing:
+                if book_key is not None:
+                    i = self.key_index.get(book_key)
+                else:
+                    i = self.index.get(book_id)
+
+                if i is None:
+                    i = len(self.book_ids)
+                    self.book_ids.append(book_id)
+                    self.titles.append(book_id)
+                    self.authors.append(None)
+                    self.index.setdefault(book_id, i)
+                    if book_key is not None:
+                        self.key_index[book_key] = i
+
+                    self.title_keys.append(book_id)
+                    added.append(len(self.title_keys) - 1)
+
+                indices.append(i)
+
+            if added:
+                self._set_titles(np.concatenate([self.title_of, np.array(added, dtype=np.int64)]))
+
+            return np.array(indices, dtype=np.int64)
+
+    def book_indices(self, book_ids):
+        """
+        Catalog index per book id, adding placeholders for ids with no
+        `books` row.
+        """
+        indices = np.array([self.index.get(bid, -1) for bid in book_ids], dtype=np.int64)
+        return self._fill_missing(indices, [(None, bid) for bid in book_ids])
+
+    def key_indices(self, book_keys):
+        """
+        book_indices() for v2 book keys.
+        """
+        indices = np.array([self.key_index.get(key, -1) for key in book_keys], dtype=np.int64)
+        return self._fill_missing(indices, [(key, str(key)) for key in book_keys])
+
+    def _fill_missing(self, indices, entries):
+        missing = np.flatnonzero(indices < 0)
+        if len(missing):
+            indices[missing] = self.placeholders([entries[i] for i in missing.tolist()])
+        return indices
+
+    def books_of_title(self, t):
+        return self.title_books[self.title_starts[t]:self.title_starts[t + 1]]
+
+
+_catalog = {"key": None, "catalog": None, "postings_map": None}
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(c):
+    """
+    The title catalog, rebuilt only when the DB file changes.
+    """
+    key = (DB_PATH, os.path.getmtime(DB_PATH))
 
-    if not is_mostly_english(query):
-        return {
-            "status": "fail",
-            "reason": "Only English books are supported"
-        }
+    with _catalog_lock:
+        if _catalog["key"] != key:
+            if get_schema_version(c) == SCHEMA_V2:
+                sql = "SELECT book_key, book_id, title, author FROM books"
+            else:
+                sql = "SELECT NULL, book_id, title, author FROM books"
 
-    query = normalize_text(query)
+            _catalog["catalog"] = TitleCatalog(c.execute(sql).fetchall())
+            _catalog["postings_map"] = None
+            _catalog["key"] = key
 
-    if len(query.split()) < 8:
-        return {
-            "status": "fail",
-            "reason": "Text too short for reliable matching"
-        }
+        return _catalog["catalog"]
 
-    word_count = len(query.split())
 
-    MIN_ALIGNED = BASE_MIN_ALIGNED if word_count < 80 else BASE_MIN_ALIGNED + 4
-    MIN_DOMINANCE = 0.45 if word_count < 80 else BASE_MIN_DOMINANCE
+def postings_book_map(postings, catalog):
+    """
+    Posting-list book index -> catalog book index.
+    """
+    with _catalog_lock:
+        cached = _catalog["postings_map"]
+        if cached is None or cached[0] is not postings or cached[1] is not catalog:
+            _catalog["postings_map"] = (
+                postings, catalog, catalog.book_indices(postings.book_ids)
+            )
+        return _catalog["postings_map"][2]
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
 
-    offset_votes = defaultdict(list)
+FINGERPRINT_SQL = {
+    "v1": "SELECT hash, book_id, position FROM fingerprints WHERE hash IN ({})",
+    "v2": "SELECT hash, book_key, position FROM fingerprints WHERE hash IN ({})",
+}
 
-    for w in WINDOW_SIZES:
-        for h, q_pos in fingerprint_query(query, w):
-            rows = c.execute(
-                "SELECT book_id, position FROM fingerprints WHERE hash=?",
-                (h,),
-            ).fetchall()
 
-            for book_id, b_pos in rows:
-                offset = int(b_pos) - int(q_pos)
-                if -1_000_000 < offset < 1_000_000:
-                    offset_votes[book_id].append(offset)
+def lookup_batched(c, hashes, version):
+    """
+    Fetch every (hash, book, position) row for `hashes`, chunked into IN
+    lists so a whole query costs a handful of round trips. `book` is the
+    book_id on v1 and the book_key on v2.
+    """
+    sql = FINGERPRINT_SQL["v2" if version == SCHEMA_V2 else "v1"]
+    hashes = list(hashes)
+    rows = []
 
-    book_titles = {
-        row[0]: normalize_text(row[1])
-        for row in c.execute("SELECT book_id, title FROM books")
-    }
+    for i in range(0, len(hashes), SQL_BATCH_SIZE):
+        chunk = hashes[i:i + SQL_BATCH_SIZE]
+        placeholders = ",".join("?" * len(chunk))
 
-    collapsed_votes = defaultdict(list)
+        rows.extend(c.execute(sql.format(placeholders), chunk).fetchall())
 
-    for book_id, offsets in offset_votes.items():
-        title_key = book_titles.get(book_id, book_id)
-        collapsed_votes[title_key].extend(offsets)
+    return rows
+
+
+_stop_hashes = {"key": None, "hashes": None}
 
-    results = []
 
-    for title_key, offsets in collapsed_votes.items():
-        if len(offsets) < MIN_TOTAL_VOTES:
-            continue
+def get_stop_hashes(c):
+    """
+    Stop-fingerprint set for MAX_DOC_FREQ, reloaded when the DB changes.
+    """
+    key = (DB_PATH, os.path.getmtime(DB_PATH), MAX_DOC_FREQ)
 
-        counter = Counter(offsets)
-        best_offset, aligned = counter.most_common(1)[0]
-        dominance = aligned / len(offsets)
+    if _stop_hashes["key"] != key:
+        _stop_hashes["hashes"] = load_stop_hashes(c.connection, MAX_DOC_FREQ)
+        _stop_hashes["key"] = key
 
-        if aligned < 3:
-            continue
+    return _stop_hashes["hashes"]
 
-        book_ids_for_title = [
-            bid for bid, t_key in book_titles.items() if t_key == title_key
-        ]
 
-        book_id_votes = {
-            bid: len(offset_votes[bid])
-            for bid in book_ids_for_title
-        }
+def fingerprint_settings(c):
+    """
+    (fingerprint_version, winnow_k) of whichever index will answer lookups.
+    """
+    postings = get_postings()
 
-        winning_book_id = max(book_id_votes, key=book_id_votes.get)
+    if postings is not None:
+        return postings.fingerprint_version, postings.winnow_k
 
-        results.append(
-            (title_key, aligned, dominance, len(offsets), winning_book_id)
-        )
+    return get_fingerprint_version(c), get_winnow_k(c)
+
+
+def query_fingerprints(c, query, settings):
+    """
+    (hashes, positions) of every query window worth looking up.
+    """
+    fp_version, winnow_k = settings
+
+    q_hashes, q_positions = fingerprint_windows(
+        query.split(), WINDOW_SIZES, fp_version, winnow_k
+    )
+
+    if MAX_DOC_FREQ is not None:
+        stop = get_stop_hashes(c)
+        if len(stop):
+            keep = ~np.isin(q_hashes, stop)
+            q_hashes, q_positions = q_hashes[keep], q_positions[keep]
+
+    return q_hashes, q_positions
+
+
+def lookup_window_hits(c, q_hashes, q_positions, catalog):
+    """
+    Look up a batch of query windows. Returns parallel (window, book, offset)
+    int arrays, one entry per hit, with books as catalog indices and
+    `window` indexing q_hashes.
+    """
+    postings = get_postings()
+
+    if postings is not None:
+        q_idx, books, positions = postings.lookup(q_hashes)
+        books = postings_book_map(postings, catalog)[books]
+        offsets = positions.astype(np.int64) - q_positions[q_idx]
+    else:
+        version = get_schema_version(c)
+
+        if version == SCHEMA_V2:
+            keys = q_hashes.tolist()
+        else:
+            keys = [int_hash_to_hex(h) for h in q_hashes.tolist()]
+
+        if SQL_LOOKUP_MODE == "per_window":
+            hits = [
+                (i, book, b_pos)
+                for i, h in enumerate(keys)
+                for _, book, b_pos in lookup_batched(c, [h], version)
+            ]
+        else:
+            windows = defaultdict(list)
+            for i, h in enumerate(keys):
+                windows[h].append(i)
+
+            hits = [
+                (i, book, b_pos)
+                for h, book, b_pos in lookup_batched(c, windows, version)
+                for i in windows[h]
+            ]
+
+        q_idx = np.array([i for i, _, _ in hits], dtype=np.int64)
+
+        if version == SCHEMA_V2:
+            books = catalog.key_indices([book for _, book, _ in hits])
+        else:
+            books = catalog.book_indices([book for _, book, _ in hits])
+
+        offsets = np.array(
+            [b_pos for _, _, b_pos in hits], dtype=np.int64
+        ) - q_positions[q_idx]
+
+    keep = (offsets > -1_000_000) & (offsets < 1_000_000)
+    return q_idx[keep], books[keep], offsets[keep]
+
+
+def lookup_offset_votes(c, q_hashes, q_positions, catalog):
+    """
+    Look up a batch of query windows. Returns parallel (book, offset) int
+    arrays, one entry per hit, with books as catalog indices.
+    """
+    _, books, offsets = lookup_window_hits(c, q_hashes, q_positions, catalog)
+    return books, offsets
+
+
+def score_titles(books, offsets, catalog, min_total_votes):
+    """
+    Offset voting per collapsed title.
+
+    Returns (title_key, aligned, dominance, votes, winning_book) tuples for
+    every title with enough votes, where `aligned` is the size of the
+    largest group of hits sharing one (book position - query position)
+    offset and `winning_book` is the title's edition with the most hits.
+    """
+    if len(books) == 0:
+        return []
+
+    n_titles = len(catalog.title_keys)
+    titles = catalog.title_of[books]
+
+    totals = np.bincount(titles, minlength=n_titles)
+
+    # Sort by (title, offset); each run of equal pairs is one aligned group.
+    order = np.lexsort((offsets, titles))
+    t = titles[order]
+    o = offsets[order]
+
+    run_starts = np.flatnonzero(np.r_[True, (t[1:] != t[:-1]) | (o[1:] != o[:-1])])
+    run_lengths = np.diff(np.r_[run_starts, len(t)])
+
+    aligned = np.zeros(n_titles, dtype=np.int64)
+    np.maximum.at(aligned, t[run_starts], run_lengths)
+
+    candidates = np.flatnonzero((totals >= min_total_votes) & (aligned >= 3))
+    if len(candidates) == 0:
+        return []
+
+    book_votes = np.bincount(books, minlength=len(catalog.book_ids))
+
+    results = []
+
+    for title in candidates.tolist():
+        editions = catalog.books_of_title(title)
+        winning_book = int(editions[np.argmax(book_votes[editions])])
+
+        results.append((
+            catalog.title_keys[title],
+            int(aligned[title]),
+            float(aligned[title] / totals[title]),
+            int(totals[title]),
+            winning_book,
+        ))
 
     results.sort(key=lambda x: (x[1], x[2], x[3]), reverse=True)
+    return results
+
+
+def spread_order(n):
+    """
+    Visit order for n windows that covers the whole query early: a golden
+    ratio sequence, so any prefix is spread roughly evenly.
+    """
+    return np.argsort((np.arange(n) * 0.6180339887498949) % 1.0, kind="stable")
+
+
+def iter_progressive(c, q_hashes, q_positions, catalog, min_total_votes, order=None):
+    """
+    Look windows up in growing batches, in `order` (spread-out by default),
+    and yield (ranked results, lookups done) after every batch.
+    """
+    n = len(q_hashes)
+    order = spread_order(n) if order is None else order
+
+    books, offsets = [], []
+    done = 0
+    batch = PROGRESSIVE_FIRST_BATCH
+
+    while done < n:
+        idx = order[done:done + batch]
+        b, o = lookup_offset_votes(c, q_hashes[idx], q_positions[idx], catalog)
+        books.append(b)
+        offsets.append(o)
+
+        done += len(idx)
+        batch *= 2
+
+        yield score_titles(
+            np.concatenate(books), np.concatenate(offsets), catalog, min_total_votes
+        ), done
+
 
+def is_decisive(results, min_aligned, min_dominance):
+    """
+    True once the leading title passes the success thresholds with room to
+    spare and far ahead of the runner-up.
+    """
     if not results:
-        conn.close()
-        return {"status": "fail", "reason": "No match found"}
+        return False
 
-    best = results[0]
-    title_key, aligned, dominance, total, winning_book_id = best
+    _, aligned, dominance, _, _ = results[0]
+    runner_up = results[1][1] if len(results) > 1 else 0
 
-    row = c.execute(
-        "SELECT title, author FROM books WHERE book_id=?",
-        (winning_book_id,),
-    ).fetchone()
+    return (
+        aligned >= min_aligned + PROGRESSIVE_MARGIN
+        and dominance >= min_dominance
+        and aligned >= PROGRESSIVE_LEAD * runner_up
+    )
 
-    title, author = row if row else (title_key, "Unknown")
+
+def match_thresholds(word_count, winnow_k):
+    """
+    (min_aligned, min_dominance, min_total_votes) for a query.
+    """
+    min_aligned = BASE_MIN_ALIGNED if word_count < 80 else BASE_MIN_ALIGNED + 4
+    min_dominance = 0.45 if word_count < 80 else BASE_MIN_DOMINANCE
+    min_total_votes = MIN_TOTAL_VOTES
+
+    if winnow_k > 1:
+        # A winnowed index keeps roughly 2 / (k + 1) of the windows, so the
+        # vote thresholds shrink with it.
+        density = 2 / (winnow_k + 1)
+        min_aligned = max(3, round(min_aligned * density))
+        min_total_votes = max(3, round(MIN_TOTAL_VOTES * density))
+
+    return min_aligned, min_dominance, min_total_votes
+
+
+def build_response(results, catalog, min_aligned, min_dominance):
+    if not results:
+        return {"status": "fail", "reason": "No match found"}
+
+    _, aligned, dominance, total, winning_book = results[0]
+
+    title = catalog.titles[winning_book]
+    author = catalog.authors[winning_book]
 
     response = {
         "title": title,
+        "book_id": catalog.book_ids[winning_book],
         "author": author if author and author.strip() else "Unknown",
         "aligned": aligned,
         "dominance": round(dominance, 2),
@@ -151,10 +507,223 @@ def run_text_search(query: str):
         ],
     }
 
-    if aligned >= MIN_ALIGNED and dominance >= MIN_DOMINANCE:
+    if aligned >= min_aligned and dominance >= min_dominance:
         response["status"] = "success"
     else:
         response["status"] = "low_confidence"
 
-    conn.close()
     return response
+
+
+def _load_text_db():
+    pool = get_pool(DB_PATH)
+    with pool.connection() as conn:
+        get_catalog(conn.cursor())
+    return pool
+
+
+def _warmup_text_db(pool):
+    with pool.connection() as conn:
+        c = conn.cursor()
+        fingerprint_settings(c)
+        c.execute("SELECT COUNT(*) FROM books").fetchone()
+
+
+def _warmup_postings(postings):
+    if postings is None:
+        return
+    # One read per 4 KB page of the sorted hashes, the array every lookup
+    # binary-searches.
+    postings.hashes[::512].sum()
+
+
+model_loader.register("text_db", _load_text_db, warmup=_warmup_text_db)
+model_loader.register("postings", get_postings, warmup=_warmup_postings)
+
+
+def check_query(query):
+    """
+    (normalized query, None), or (None, fail response) for unusable input.
+    """
+    if not query or not query.strip():
+        return None, {"status": "fail", "reason": "Empty query"}
+
+    if not is_mostly_english(query):
+        return None, {
+            "status": "fail",
+            "reason": "Only English books are supported"
+        }
+
+    query = normalize_text(query)
+
+    if len(query.split()) < 8:
+        return None, {
+            "status": "fail",
+            "reason": "Text too short for reliable matching"
+        }
+
+    return query, None
+
+
+def run_text_search(query: str, progressive: bool = False):
+    """
+    Perform text-based book identification.
+
+    With progressive=True, windows are looked up in spread-out batches and
+    the search stops once one title clearly wins; the response then reports
+    how many lookups that saved.
+    """
+
+    query, failure = check_query(query)
+    if failure:
+        return failure
+
+    word_count = len(query.split())
+
+    with get_pool(DB_PATH).connection() as conn:
+        c = conn.cursor()
+
+        settings = fingerprint_settings(c)
+        min_aligned, min_dominance, min_total_votes = match_thresholds(
+            word_count, settings[1]
+        )
+
+        catalog = get_catalog(c)
+        q_hashes, q_positions = query_fingerprints(c, query, settings)
+
+        if progressive:
+            results, done = [], 0
+            for results, done in iter_progressive(
+                c, q_hashes, q_positions, catalog, min_total_votes
+            ):
+                if is_decisive(results, min_aligned, min_dominance):
+                    break
+        else:
+            books, offsets = lookup_offset_votes(c, q_hashes, q_positions, catalog)
+            results = score_titles(books, offsets, catalog, min_total_votes)
+
+        c.close()
+
+    response = build_response(results, catalog, min_aligned, min_dominance)
+
+    if progressive:
+        response["lookups"] = {
+            "performed": done,
+            "total": len(q_hashes),
+            "saved": len(q_hashes) - done,
+        }
+
+    return response
+
+
+def run_text_search_batch(queries):
+    """
+    Identify many excerpts in one call. Returns one response per query, in
+    order, as run_text_search would (non-progressive).
+
+    All queries share one connection, catalog and stop-list, and their
+    windows go to the index in a single lookup, so repeated windows across
+    excerpts are fetched once.
+    """
+    responses = [None] * len(queries)
+    checked = []
+
+    for i, query in enumerate(queries):
+        query, failure = check_query(query)
+        if failure:
+            responses[i] = failure
+        else:
+            checked.append((i, query))
+
+    if not checked:
+        return responses
+
+    with get_pool(DB_PATH).connection() as conn:
+        c = conn.cursor()
+
+        settings = fingerprint_settings(c)
+        catalog = get_catalog(c)
+
+        fingerprints = [query_fingerprints(c, query, settings) for _, query in checked]
+        window_counts = [len(h) for h, _ in fingerprints]
+
+        q_hashes = np.concatenate([h for h, _ in fingerprints])
+        q_positions = np.concatenate([p for _, p in fingerprints])
+        item_of_window = np.repeat(np.arange(len(checked)), window_counts)
+
+        q_idx, books, offsets = lookup_window_hits(c, q_hashes, q_positions, catalog)
+
+        c.close()
+
+    # Group the hits by the query they came from.
+    items = item_of_window[q_idx]
+    order = np.argsort(items, kind="stable")
+    ends = np.cumsum(np.bincount(items, minlength=len(checked)))
+    starts = ends - np.bincount(items, minlength=len(checked))
+
+    for n, (i, query) in enumerate(checked):
+        hits = order[starts[n]:ends[n]]
+
+        min_aligned, min_dominance, min_total_votes = match_thresholds(
+            len(query.split()), settings[1]
+        )
+        results = score_titles(books[hits], offsets[hits], catalog, min_total_votes)
+        responses[i] = build_response(results, catalog, min_aligned, min_dominance)
+
+    return responses
+
+
+def iter_text_search(query: str):
+    """
+    Progressive text search as a stream of responses.
+
+    Yields the current top candidates after every lookup batch (see
+    iter_progressive), each with "lookups" and "final" fields. The last one
+    has final=True: one title became decisive or every window was looked
+    up. Closing the generator early releases the connection and stops the
+    remaining lookups.
+    """
+    query, failure = check_query(query)
+    if failure:
+        yield {**failure, "final": True}
+        return
+
+    word_count = len(query.split())
+
+    with get_pool(DB_PATH).connection() as conn:
+        c = conn.cursor()
+
+        settings = fingerprint_settings(c)
+        min_aligned, min_dominance, min_total_votes = match_thresholds(
+            word_count, settings[1]
+        )
+
+        catalog = get_catalog(c)
+        q_hashes, q_positions = query_fingerprints(c, query, settings)
+
+        if len(q_hashes) == 0:
+            yield {"status": "fail", "reason": "No match found", "final": True}
+            return
+
+        try:
+            for results, done in iter_progressive(
+                c, q_hashes, q_positions, catalog, min_total_votes
+            ):
+                decisive = is_decisive(results, min_aligned, min_dominance)
+
+                response = build_response(results, catalog, min_aligned, min_dominance)
+                response["lookups"] = {"performed": done, "total": len(q_hashes)}
+                response["final"] = decisive or done == len(q_hashes)
+
+                yield response
+
+                if response["final"]:
+                    break
+        finally:
+            c.close()
+
+
+def last_text_search_event(query: str):
+    for event in iter_text_search(query):
+        pass
+    return event
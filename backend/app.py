@@ -1,17 +1,31 @@
 from fastapi import HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import traceback
 from fastapi import FastAPI, UploadFile, File
+from typing import List
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from backend.api.text_search import run_text_search
-from backend.api.image_search import run_image_search
+from backend.api.text_search import iter_text_search, last_text_search_event, run_text_search, run_text_search_batch
+from backend.api.image_search import CASCADE, cascade_stats, run_image_search, run_image_search_batch, ocr_cache
+from backend.api.ocr_preprocess import DEFAULT_MODE as DEFAULT_OCR_MODE, MODES as OCR_MODES
+from backend.api.db import all_pools
+from backend.api.batching import all_batchers
+from backend.api.embedding_cache import embedding_cache
+from backend.api.executors import PROCESS, PoolFullError, all_executors, image_executor, text_executor
+from backend.api import model_loader
+import threading
+import asyncio
+import json
+from functools import partial
 import tempfile
 import os
 import imghdr
 
 MAX_FILE_SIZE = 5 * 1024 * 1024  
 ALLOWED_TYPES = ["jpeg", "png", "jpg"]
+MAX_BATCH_TEXTS = 500
+MAX_BATCH_IMAGES = 32
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
 
 
 app = FastAPI()
@@ -30,6 +44,10 @@ app.add_middleware(
 
 class TextSearchRequest(BaseModel):
     text: str
+    progressive: bool = False
+
+class TextSearchBatchRequest(BaseModel):
+    texts: List[str]
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -45,11 +63,65 @@ async def global_exception_handler(request: Request, exc: Exception):
         },
     )
 
-@app.post("/text-search")
-async def text_search_endpoint(payload: TextSearchRequest):
+@app.exception_handler(PoolFullError)
+async def pool_full_handler(request: Request, exc: PoolFullError):
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": "1"},
+        content={
+            "detail": {
+                "status": "fail",
+                "type": "server_busy",
+                "message": "The server is busy. Please try again shortly."
+            }
+        },
+    )
 
-    query = payload.text.strip()
+@app.on_event("startup")
+async def preload_components():
+    # Load this worker's components in the background so the server starts
+    # accepting connections at once; /ready reports when they are usable.
+    threading.Thread(
+        target=model_loader.preload,
+        args=(model_loader.configured_components(), model_loader.warmup_enabled()),
+        daemon=True,
+    ).start()
+
+
+@app.on_event("shutdown")
+async def stop_executors():
+    for executor in all_executors():
+        executor.shutdown()
+
+
+@app.get("/health")
+def health():
+    pools = [pool.health() for pool in all_pools()]
+    ok = all(p["status"] == "ok" for p in pools)
 
+    return JSONResponse(
+        status_code=200 if ok else 503,
+        content={
+            "status": "ok" if ok else "degraded",
+            "db": pools,
+            "batching": [b.stats() for b in all_batchers()],
+            "executors": [e.stats() for e in all_executors()],
+            "ocr_cache": ocr_cache.stats(),
+            "embedding_cache": embedding_cache.stats(),
+            "image_cascade": cascade_stats(),
+        },
+    )
+
+@app.get("/ready")
+async def ready():
+    report = model_loader.readiness(model_loader.configured_components())
+
+    return JSONResponse(
+        status_code=200 if report["status"] == "ready" else 503,
+        content=report,
+    )
+
+def check_text_length(query):
     if len(query.split()) < 8:
         raise HTTPException(
             status_code=400,
@@ -70,20 +142,18 @@ async def text_search_endpoint(payload: TextSearchRequest):
             }
         )
 
-    result = run_text_search(query)
-    
-    if result["status"] == "fail":
-        return {
-            "status": "fail",
-            "type": "no_match",
-            "message": result.get("reason", "No match found.")
-        }
-
-    return result
-
-@app.post("/image-search")
-async def image_search_endpoint(file: UploadFile = File(...)):
+def check_ocr_mode(ocr_mode):
+    if ocr_mode not in OCR_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "fail",
+                "type": "invalid_ocr_mode",
+                "message": f"ocr_mode must be one of: {', '.join(OCR_MODES)}."
+            }
+        )
 
+async def read_image_upload(file):
     file_ext = file.filename.split(".")[-1].lower()
     if file_ext not in ALLOWED_TYPES:
         raise HTTPException(
@@ -107,11 +177,145 @@ async def image_search_endpoint(file: UploadFile = File(...)):
             }
         )
 
+    return contents
+
+def check_batch_size(count, limit):
+    if count == 0:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "fail",
+                "type": "empty_batch",
+                "message": "The batch has no items."
+            }
+        )
+
+    if count > limit:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "status": "fail",
+                "type": "batch_too_large",
+                "message": f"At most {limit} items per batch."
+            }
+        )
+
+def batch_item(index, result):
+    if result["status"] in ("fail", "error"):
+        return {
+            "index": index,
+            "status": result["status"],
+            "type": "no_match" if result["status"] == "fail" else "unreadable_image",
+            "message": result.get("reason", "No match found.")
+        }
+
+    return {"index": index, **result}
+
+def batch_item_error(index, exc):
+    return {"index": index, **exc.detail}
+
+@app.post("/text-search")
+async def text_search_endpoint(payload: TextSearchRequest):
+
+    query = payload.text.strip()
+    check_text_length(query)
+
+    result = await text_executor.run(
+        partial(run_text_search, query, progressive=payload.progressive)
+    )
+    
+    if result["status"] == "fail":
+        return {
+            "status": "fail",
+            "type": "no_match",
+            "message": result.get("reason", "No match found.")
+        }
+
+    return result
+
+@app.post("/text-search/stream")
+async def text_search_stream_endpoint(payload: TextSearchRequest, format: str = "ndjson"):
+    """
+    Progressive text search that reports the current top candidates after
+    every lookup batch, as NDJSON lines or server-sent events. The last
+    event has "final": true. If the client goes away, the search stops at
+    the next batch.
+    """
+
+    if format not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "fail",
+                "type": "invalid_format",
+                "message": f"format must be one of: {', '.join(STREAM_FORMATS)}."
+            }
+        )
+
+    query = payload.text.strip()
+    check_text_length(query)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    cancel = threading.Event()
+
+    def produce():
+        search = iter_text_search(query)
+        try:
+            for event in search:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+                if cancel.is_set():
+                    break
+        except Exception as exc:
+            print("STREAM ERROR:", str(exc))
+            traceback.print_exc()
+            loop.call_soon_threadsafe(events.put_nowait, {
+                "status": "error",
+                "type": "internal_server_error",
+                "message": "Something went wrong on our server.",
+                "final": True,
+            })
+        finally:
+            search.close()
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    if text_executor.kind == PROCESS:
+        # Worker processes can't feed this request's queue: run the search
+        # to the end there and send its final state as the only event.
+        events.put_nowait(await text_executor.run(last_text_search_event, query))
+        events.put_nowait(None)
+    else:
+        # Submitted before the response starts, so a full pool is still a 429.
+        text_executor.submit(produce)
+
+    async def body():
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                data = json.dumps(event)
+                yield f"data: {data}\n\n" if format == "sse" else data + "\n"
+        finally:
+            cancel.set()
+
+    return StreamingResponse(body(), media_type=STREAM_FORMATS[format])
+
+@app.post("/image-search")
+async def image_search_endpoint(
+    file: UploadFile = File(...),
+    ocr_mode: str = DEFAULT_OCR_MODE,
+    cascade: bool = CASCADE,
+):
+
+    check_ocr_mode(ocr_mode)
+    contents = await read_image_upload(file)
+
     with tempfile.NamedTemporaryFile(delete=False) as tmp:
         tmp.write(contents)
         image_path = tmp.name
 
-    result = run_image_search(image_path)
+    result = await image_executor.run(run_image_search, image_path, ocr_mode, cascade)
 
     if result["status"] == "fail":
         raise HTTPException(
@@ -125,3 +329,75 @@ async def image_search_endpoint(file: UploadFile = File(...)):
 
     return result
 
+
+@app.post("/text-search/batch")
+async def text_search_batch_endpoint(payload: TextSearchBatchRequest):
+    """
+    Identify many excerpts in one request. "results" holds one entry per
+    text, in order, each with its "index"; a text that fails the usual
+    checks gets its own fail entry instead of failing the whole batch.
+    """
+
+    check_batch_size(len(payload.texts), MAX_BATCH_TEXTS)
+
+    results = [None] * len(payload.texts)
+    queries = []
+
+    for i, text in enumerate(payload.texts):
+        query = text.strip()
+        try:
+            check_text_length(query)
+        except HTTPException as exc:
+            results[i] = batch_item_error(i, exc)
+            continue
+        queries.append((i, query))
+
+    if queries:
+        responses = await text_executor.run(
+            run_text_search_batch, [query for _, query in queries]
+        )
+        for (i, _), result in zip(queries, responses):
+            results[i] = batch_item(i, result)
+
+    return {"status": "ok", "results": results}
+
+@app.post("/image-search/batch")
+async def image_search_batch_endpoint(
+    files: List[UploadFile] = File(...),
+    ocr_mode: str = DEFAULT_OCR_MODE,
+    cascade: bool = CASCADE,
+):
+    """
+    Identify many page photos (multipart "files") in one request, with
+    per-item results as in /text-search/batch.
+    """
+
+    check_ocr_mode(ocr_mode)
+    check_batch_size(len(files), MAX_BATCH_IMAGES)
+
+    results = [None] * len(files)
+    uploads = []
+
+    try:
+        for i, file in enumerate(files):
+            try:
+                contents = await read_image_upload(file)
+            except HTTPException as exc:
+                results[i] = batch_item_error(i, exc)
+                continue
+
+            with tempfile.NamedTemporaryFile(delete=False) as tmp:
+                tmp.write(contents)
+                uploads.append((i, tmp.name))
+
+        if uploads:
+            responses = await image_executor.run(
+                run_image_search_batch, [path for _, path in uploads], ocr_mode, cascade
+            )
+            for (i, _), result in zip(uploads, responses):
+                results[i] = batch_item(i, result)
+    finally:
+        for _, path in uploads:
+            os.remove(path)
+
+    return {"status": "ok", "results": results}
@@ -0,0 +1,107 @@
+import time
+import argparse
+import faiss
+import numpy as np
+
+from backend.api.ann import build_ann_index, factory_string, flat_vectors, index_bytes, search
+
+INDEX_PATH = "books.index"
+TOP_K = 6
+
+# OCR text never matches a stored chunk exactly; queries are stored vectors
+# plus this much gaussian noise (before re-normalizing).
+QUERY_NOISE = 0.05
+
+NPROBES = [1, 4, 8, 16, 32, 64]
+EF_SEARCHES = [16, 32, 64, 128, 256]
+
+
+def make_queries(vectors, n, seed):
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), n, replace=False)].copy()
+    queries += rng.standard_normal(queries.shape).astype(np.float32) * QUERY_NOISE
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(truth, found):
+    hits = sum(len(set(t) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def timed_search(index, queries, k, **params):
+    search(index, queries[:8], k, **params)
+    start = time.perf_counter()
+    _, found = search(index, queries, k, **params)
+    return found, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="recall@TOP_K, latency and memory of approximate FAISS indexes vs the flat index."
+    )
+    parser.add_argument("--source", default=INDEX_PATH, help="exact IndexFlatIP")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="ROWS",
+                        help="use ROWS clustered random 384-d vectors instead of --source")
+    parser.add_argument("--types", nargs="+", default=["ivf_flat", "ivf_pq", "hnsw"])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--pq-m", type=int)
+    parser.add_argument("--threads", type=int, default=1, help="faiss OpenMP threads while searching")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    build_threads = faiss.omp_get_max_threads()
+
+    if args.synthetic:
+        rng = np.random.default_rng(args.seed)
+        centers = rng.standard_normal((max(args.synthetic // 200, 1), 384)).astype(np.float32)
+        vectors = centers[rng.integers(len(centers), size=args.synthetic)]
+        vectors += rng.standard_normal(vectors.shape).astype(np.float32) * 0.5
+        faiss.normalize_L2(vectors)
+        flat = faiss.IndexFlatIP(vectors.shape[1])
+        flat.add(vectors)
+    else:
+        flat = faiss.read_index(args.source)
+        vectors = flat_vectors(flat)
+
+    print(f"Vectors: {flat.ntotal:,} x {flat.d}, {args.queries} queries, k={args.k}")
+
+    queries = make_queries(vectors, args.queries, args.seed)
+    faiss.omp_set_num_threads(args.threads)
+    truth, flat_ms = timed_search(flat, queries, args.k)
+
+    print(f"\n{'index':<26}{'param':>12}{'recall':>9}{'ms/query':>10}{'MB':>9}{'build s':>9}")
+    print(f"{'Flat':<26}{'-':>12}{1.0:>9.3f}{flat_ms:>10.3f}{index_bytes(flat) / 1e6:>9.1f}{'-':>9}")
+
+    for kind in args.types:
+        spec = factory_string(kind, flat.d, flat.ntotal, args.nlist, args.pq_m)
+
+        faiss.omp_set_num_threads(build_threads)
+        start = time.time()
+        index = build_ann_index(vectors, kind, args.nlist, args.pq_m, seed=args.seed)
+        build_s = time.time() - start
+        faiss.omp_set_num_threads(args.threads)
+        size_mb = index_bytes(index) / 1e6
+
+        if kind == "hnsw":
+            sweep = [("efSearch", ef, {"ef_search": ef}) for ef in EF_SEARCHES]
+        else:
+            nlist = faiss.extract_index_ivf(index).nlist
+            sweep = [("nprobe", p, {"nprobe": p}) for p in NPROBES if p <= nlist]
+
+        for name, value, params in sweep:
+            found, ms = timed_search(index, queries, args.k, **params)
+            print(
+                f"{spec:<26}"
+                f"{f'{name}={value}':>12}"
+                f"{recall_at_k(truth, found):>9.3f}"
+                f"{ms:>10.3f}"
+                f"{size_mb:>9.1f}"
+                f"{build_s:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import time
+import argparse
+import faiss
+import numpy as np
+
+from backend.api.embedding_store import open_store
+from backend.api.encoders import BACKENDS, QUANT_CONFIG, load_encoder
+from backend.api.meta_store import MetaStore
+
+INDEX_PATH = "books.index"
+META_STORE_DIR = "books_meta"
+MPNET_STORE_PATH = "mpnet_store.npy"
+MINILM_DIR = "./models/minilm"
+MPNET_DIR = "./models/mpnet"
+
+# Mirrors backend/api/image_search.py
+TOP_K = 6
+MAX_RERANK_PREVIEWS = 12
+ANTHOLOGY_KEYWORDS = ["complete works", "collected works", "collection", "anthology", "全集"]
+
+# Fraction of words dropped from each preview to stand in for OCR noise.
+WORD_DROP = 0.15
+
+
+def make_queries(meta, n, seed):
+    rng = np.random.default_rng(seed)
+    queries = []
+    for row in rng.choice(len(meta), n, replace=False):
+        words = meta.preview(int(row)).split()
+        keep = rng.random(len(words)) >= WORD_DROP
+        queries.append(" ".join(w for w, k in zip(words, keep) if k) or meta.preview(int(row)))
+    return queries
+
+
+def timed_encode(model, texts):
+    """
+    Embeddings of `texts` one request at a time, plus mean ms per call.
+    """
+    model.encode(texts[:2])
+    out = []
+    start = time.perf_counter()
+    for text in texts:
+        out.append(model.encode([text])[0])
+    return np.asarray(out, dtype=np.float32), (time.perf_counter() - start) / len(texts) * 1000
+
+
+def top1(index, meta, mpnet_store, anthology, mini_emb, mpnet_emb):
+    """
+    (book number, rerank score) per query: flat-index candidates reranked by
+    mean MPNet similarity, as in fast_search + rerank_candidates.
+    """
+    mini_emb = mini_emb.copy()
+    faiss.normalize_L2(mini_emb)
+    _, I = index.search(mini_emb, TOP_K)
+
+    mpnet_emb = mpnet_emb / np.linalg.norm(mpnet_emb, axis=1, keepdims=True)
+
+    results = []
+    for neighbors, q in zip(I, mpnet_emb):
+        books = np.unique(meta.book_of_row[neighbors[neighbors >= 0]])
+        rows, counts = meta.rows_of_books(books, MAX_RERANK_PREVIEWS)
+        row_sims = mpnet_store[rows].astype(np.float32) @ q
+        scores = np.add.reduceat(row_sims, np.cumsum(counts) - counts) / counts
+        scores[anthology[books]] *= 0.80
+        best = int(np.argmax(scores))
+        results.append((int(books[best]), float(scores[best])))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Encode latency, top-1 agreement and rerank score drift of encoder backends vs PyTorch."
+    )
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--quant", default=QUANT_CONFIG, help="int8 file variant")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = faiss.read_index(INDEX_PATH)
+    meta = MetaStore(META_STORE_DIR)
+    mpnet_store = open_store(MPNET_STORE_PATH)
+    anthology = np.array(
+        [any(k in name.lower() for k in ANTHOLOGY_KEYWORDS) for name in meta.book_names.tolist()]
+    )
+
+    queries = make_queries(meta, args.queries, args.seed)
+    print(f"Queries: {len(queries)} previews with {WORD_DROP:.0%} of words dropped")
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    baseline = None
+
+    print(
+        f"\n{'backend':<11}{'MiniLM ms':>11}{'MPNet ms':>10}{'top-1 agree':>13}"
+        f"{'min cos':>9}{'drift mean':>12}{'drift max':>11}"
+    )
+
+    for backend in backends:
+        minilm = load_encoder(MINILM_DIR, backend, args.quant)
+        mpnet = load_encoder(MPNET_DIR, backend, args.quant)
+
+        mini_emb, mini_ms = timed_encode(minilm, queries)
+        mpnet_emb, mpnet_ms = timed_encode(mpnet, queries)
+        results = top1(index, meta, mpnet_store, anthology, mini_emb, mpnet_emb)
+
+        if baseline is None:
+            baseline = (mini_emb, mpnet_emb, results)
+
+        base_mini, base_mpnet, base_results = baseline
+
+        def min_cos(a, b):
+            a = a / np.linalg.norm(a, axis=1, keepdims=True)
+            b = b / np.linalg.norm(b, axis=1, keepdims=True)
+            return float((a * b).sum(axis=1).min())
+
+        agree = np.mean([r[0] == b[0] for r, b in zip(results, base_results)])
+        drift = np.abs([r[1] - b[1] for r, b in zip(results, base_results)])
+
+        print(
+            f"{backend:<11}"
+            f"{mini_ms:>11.2f}"
+            f"{mpnet_ms:>10.2f}"
+            f"{agree:>13.3f}"
+            f"{min(min_cos(mini_emb, base_mini), min_cos(mpnet_emb, base_mpnet)):>9.4f}"
+            f"{drift.mean():>12.4f}"
+            f"{drift.max():>11.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
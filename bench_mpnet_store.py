@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from backend.api.embedding_store import open_store, write_store
+
+MPNET_EMB_PATH = "mpnet_embeddings.npy"
+MPNET_STORE_PATH = "mpnet_store.npy"
+
+# Same shape as rerank_candidates(): a handful of OCR chunks against up to
+# MAX_RERANK_PREVIEWS previews for each candidate book.
+QUERY_CHUNKS = 6
+CANDIDATE_BOOKS = 6
+MAX_RERANK_PREVIEWS = 12
+
+
+def rss_mb():
+    """
+    (private, file-backed) resident MB of this process. Linux only; file
+    pages are the page cache that other workers share.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+    except OSError:
+        return None, None
+
+    def mb(key):
+        return int(fields[key].split()[0]) / 1024 if key in fields else None
+
+    return mb("RssAnon"), mb("RssFile")
+
+
+def load(mode, path):
+    if mode == "legacy":
+        # What image_search.py did before the store existed.
+        embeddings = np.load(path)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    return open_store(path)
+
+
+def rerank(embeddings, queries, candidate_rows):
+    for q in queries:
+        for rows in candidate_rows:
+            emb_book = embeddings[rows].astype(np.float32)
+            np.dot(q, emb_book.T).mean()
+
+
+def worker(mode, path, iterations, seed):
+    start = time.perf_counter()
+    embeddings = load(mode, path)
+    load_s = time.perf_counter() - start
+
+    rows, dim = embeddings.shape
+    rng = np.random.default_rng(seed)
+
+    queries = rng.standard_normal((iterations, QUERY_CHUNKS, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=2, keepdims=True)
+
+    candidate_rows = []
+    for _ in range(CANDIDATE_BOOKS):
+        first = int(rng.integers(0, max(rows - MAX_RERANK_PREVIEWS, 1)))
+        candidate_rows.append(list(range(first, min(first + MAX_RERANK_PREVIEWS, rows))))
+
+    # One cold pass, then the timed ones.
+    rerank(embeddings, queries[:1], candidate_rows)
+
+    start = time.perf_counter()
+    rerank(embeddings, queries, candidate_rows)
+    rerank_ms = (time.perf_counter() - start) / iterations * 1000
+
+    private, shared = rss_mb()
+
+    print(json.dumps({
+        "load_s": load_s,
+        "rerank_ms": rerank_ms,
+        "private_mb": private,
+        "shared_mb": shared,
+    }))
+
+
+def run_worker(mode, path, iterations, seed):
+    out = subprocess.run(
+        [sys.executable, __file__, "--worker", mode, path,
+         "--iterations", str(iterations), "--seed", str(seed)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def fmt(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="RSS and rerank latency: in-memory MPNet embeddings vs the mmap store."
+    )
+    parser.add_argument("--emb", default=MPNET_EMB_PATH, help="raw float32 embeddings")
+    parser.add_argument("--workers", type=int, default=4, help="worker count for the RSS projection")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--synthetic", type=int, default=0, metavar="ROWS",
+        help="benchmark a random ROWS x 768 matrix instead of --emb",
+    )
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker, args.iterations, args.seed)
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix="mpnet_bench_")
+    emb_path = args.emb
+
+    if args.synthetic:
+        emb_path = os.path.join(tmp_dir, "synthetic.npy")
+        rng = np.random.default_rng(args.seed)
+        np.save(emb_path, rng.standard_normal((args.synthetic, 768)).astype(np.float32))
+
+    raw = np.load(emb_path, mmap_mode="r")
+    print(f"Embeddings: {raw.shape[0]:,} x {raw.shape[1]} ({os.path.getsize(emb_path) / 1e6:.1f} MB)")
+
+    runs = [("legacy", emb_path)]
+    for dtype in ("float32", "float16"):
+        store_path = os.path.join(tmp_dir, f"store_{dtype}.npy")
+        write_store(raw, store_path, dtype)
+        runs.append((f"mmap {dtype}", store_path))
+
+    print(
+        f"\n{'mode':<14}{'file MB':>9}{'load s':>9}{'rerank ms':>11}"
+        f"{'private MB':>12}{'shared MB':>11}{f'{args.workers} workers MB':>16}"
+    )
+
+    for label, path in runs:
+        mode = "legacy" if label == "legacy" else "store"
+        r = run_worker(mode, path, args.iterations, args.seed)
+
+        total = None
+        if r["private_mb"] is not None:
+            # Private pages are paid per worker, page cache once per host.
+            total = r["private_mb"] * args.workers + r["shared_mb"]
+
+        print(
+            f"{label:<14}"
+            f"{os.path.getsize(path) / 1e6:>9.1f}"
+            f"{r['load_s']:>9.3f}"
+            f"{r['rerank_ms']:>11.3f}"
+            f"{fmt(r['private_mb'], '.1f'):>12}"
+            f"{fmt(r['shared_mb'], '.1f'):>11}"
+            f"{fmt(total, '.1f'):>16}"
+        )
+
+    # Accuracy cost of float16: worst cosine drift on a sample of rows.
+    rows = np.arange(min(len(raw), 10_000))
+    exact = np.asarray(raw[rows], dtype=np.float32)
+    exact /= np.linalg.norm(exact, axis=1, keepdims=True)
+    half = open_store(runs[-1][1])[rows].astype(np.float32)
+    drift = np.abs((exact * exact).sum(1) - (exact * half).sum(1)).max()
+    print(f"\nfloat16 max self-cosine drift: {drift:.2e}")
+
+    del raw, half
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
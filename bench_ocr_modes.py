@@ -0,0 +1,97 @@
+import os
+import csv
+import time
+import argparse
+import numpy as np
+
+import backend.api.image_search as image_search
+from backend.api.ocr_cache import OCRCache
+from backend.api.ocr_preprocess import MODES
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def book_key(name):
+    return name.lower().replace(".txt", "").strip()
+
+
+def load_photos(photo_dir, labels_path):
+    """
+    [(path, expected book)]. Labels come from a CSV of image,book rows, or
+    else from file names like "<book_id>__page3.jpg".
+    """
+    labels = {}
+    if labels_path:
+        with open(labels_path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and not row[0].startswith("#"):
+                    labels[row[0].strip()] = row[1].strip()
+
+    photos = []
+    for filename in sorted(os.listdir(photo_dir)):
+        if not filename.lower().endswith(IMAGE_EXTS):
+            continue
+        if labels_path:
+            book = labels.get(filename)
+        else:
+            book = filename.split("__")[0] if "__" in filename else None
+        if book:
+            photos.append((os.path.join(photo_dir, filename), book))
+
+    return photos
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="OCR time vs downstream match rate for each OCR preprocessing mode."
+    )
+    parser.add_argument("photo_dir")
+    parser.add_argument("--labels", help="CSV of image_filename,book_id")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    photos = load_photos(args.photo_dir, args.labels)
+    if not photos:
+        raise SystemExit(f"No labelled photos in {args.photo_dir}")
+
+    print(f"Photos: {len(photos)}")
+
+    rows = []
+    for mode in args.modes:
+        # Fresh memory-only cache: extract_text() below always runs OCR, and
+        # run_image_search() then reuses that result instead of repeating it.
+        image_search.ocr_cache = OCRCache(None)
+
+        ocr_ms, words, matched, answered = [], [], 0, 0
+
+        for path, book in photos:
+            start = time.perf_counter()
+            text = image_search.extract_text(path, mode)
+            ocr_ms.append((time.perf_counter() - start) * 1000)
+            words.append(len(text.split()))
+
+            result = image_search.run_image_search(path, mode)
+            if result["status"] == "success":
+                answered += 1
+                matched += book_key(result["book"]) == book_key(book)
+
+        rows.append((mode, ocr_ms, words, answered, matched))
+
+    print(
+        f"\n{'mode':<10}{'ocr ms':>9}{'p95 ms':>9}{'words':>8}"
+        f"{'answered':>10}{'matched':>9}{'match %':>9}"
+    )
+    for mode, ocr_ms, words, answered, matched in rows:
+        print(
+            f"{mode:<10}"
+            f"{np.mean(ocr_ms):>9.0f}"
+            f"{np.percentile(ocr_ms, 95):>9.0f}"
+            f"{np.mean(words):>8.0f}"
+            f"{answered:>10}"
+            f"{matched:>9}"
+            f"{matched / len(photos) * 100:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import time
+import argparse
+import faiss
+
+from backend.api.ann import INDEX_TYPES, build_ann_index, factory_string, flat_vectors, index_bytes
+
+INDEX_PATH = "books.index"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build an approximate FAISS index from the vectors of the exact books.index."
+    )
+    parser.add_argument("type", choices=[t for t in INDEX_TYPES if t != "flat"])
+    parser.add_argument("out_path", nargs="?", help="default: books_<type>.index")
+    parser.add_argument("--source", default=INDEX_PATH, help="exact IndexFlatIP to read vectors from")
+    parser.add_argument("--nlist", type=int, help="IVF cells (default ~4 sqrt(n))")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ sub-quantizers (default dim / 8)")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node")
+    args = parser.parse_args()
+
+    out_path = args.out_path or f"books_{args.type}.index"
+
+    start = time.time()
+    source = faiss.read_index(args.source)
+    vectors = flat_vectors(source)
+    print(f"Read {source.ntotal:,} x {source.d} vectors from {args.source} ({time.time() - start:.1f}s)")
+
+    spec = factory_string(args.type, source.d, source.ntotal, args.nlist, args.pq_m, args.hnsw_m)
+    print(f"Building {spec}...")
+
+    start = time.time()
+    index = build_ann_index(vectors, args.type, args.nlist, args.pq_m, args.hnsw_m)
+    elapsed = time.time() - start
+
+    tmp_path = out_path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, out_path)
+
+    print(f"Built in {elapsed:.1f}s")
+    print(f"Size: {index_bytes(source) / 1e6:.1f} MB flat -> {os.path.getsize(out_path) / 1e6:.1f} MB")
+    print(f"Saved to: {out_path}")
+    print("Point INDEX_PATH in backend/api/image_search.py at it to serve it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,41 @@
 import os
 import time
+import argparse
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from backend.api.embedding_store import STORE_DTYPES, write_store
+from backend.api.meta_store import MetaStore, is_meta_store
 
 META_PATH = "books_meta.npy"
+META_STORE_DIR = "books_meta"
 MPNET_DIR = "./models/mpnet"
 MPNET_EMB_PATH = "mpnet_embeddings.npy"
+# Pre-normalized store the server memory-maps (see backend/api/embedding_store.py)
+MPNET_STORE_PATH = "mpnet_store.npy"
+STORE_DTYPE = "float16"
+
+parser = argparse.ArgumentParser(description="Build the MPNet preview embedding cache.")
+parser.add_argument("--dtype", choices=STORE_DTYPES, default=STORE_DTYPE)
+parser.add_argument(
+    "--store-only",
+    action="store_true",
+    help=f"only rebuild {MPNET_STORE_PATH} from an existing {MPNET_EMB_PATH}",
+)
+args = parser.parse_args()
+
+if args.store_only:
+    start_time = time.time()
+    embeddings = np.load(MPNET_EMB_PATH, mmap_mode="r")
+    write_store(embeddings, MPNET_STORE_PATH, args.dtype)
+    print(f"Wrote {MPNET_STORE_PATH}: {embeddings.shape[0]} x {embeddings.shape[1]} {args.dtype}")
+    print(f"Time taken: {round(time.time() - start_time, 2)} seconds")
+    raise SystemExit(0)
 
-if not os.path.exists(META_PATH):
+if not is_meta_store(META_STORE_DIR) and not os.path.exists(META_PATH):
     raise FileNotFoundError("books_meta.npy not found. Build main index first.")
 
+from sentence_transformers import SentenceTransformer
+
 print("\n==============================")
 print("Building MPNet Embedding Cache")
 print("==============================\n")
@@ -20,9 +46,12 @@ print("Loading MPNet model...")
 mpnet = SentenceTransformer(MPNET_DIR)
 
 print("Loading metadata...")
-metadata = np.load(META_PATH, allow_pickle=True)
+if is_meta_store(META_STORE_DIR):
+    previews = list(MetaStore(META_STORE_DIR).iter_previews())
+else:
+    metadata = np.load(META_PATH, allow_pickle=True)
+    previews = [m["preview"] for m in metadata]
 
-previews = [m["preview"] for m in metadata]
 total_previews = len(previews)
 
 print(f"\nTotal previews to encode: {total_previews}")
@@ -37,11 +66,15 @@ embeddings = mpnet.encode(
 print("\nSaving embeddings...")
 np.save(MPNET_EMB_PATH, embeddings)
 
+print(f"Writing normalized {args.dtype} store...")
+write_store(embeddings, MPNET_STORE_PATH, args.dtype)
+
 elapsed = time.time() - start_time
 
 print("\n================================")
 print("✅ MPNet cache successfully built!")
 print(f"Total vectors saved: {len(embeddings)}")
 print(f"Saved to: {MPNET_EMB_PATH}")
+print(f"Server store: {MPNET_STORE_PATH} ({args.dtype}, normalized)")
 print(f"Time taken: {round(elapsed, 2)} seconds")
 print("================================\n")
@@ -0,0 +1,45 @@
+import os
+import time
+import argparse
+
+from backend.api.postings import build_postings, PostingIndex
+
+DB_PATH = "books.db"
+POSTINGS_DIR = "books_postings"
+
+if not os.path.exists(DB_PATH):
+    raise FileNotFoundError("books.db not found. Run index_books.py first.")
+
+parser = argparse.ArgumentParser(description="Compile books.db fingerprints into posting lists.")
+parser.add_argument("out_dir", nargs="?", default=POSTINGS_DIR)
+parser.add_argument(
+    "--max-df", type=int, default=None,
+    help="leave out hashes that occur in more than this many books",
+)
+args = parser.parse_args()
+
+out_dir = args.out_dir
+
+print("\n==============================")
+print("Compiling Fingerprint Postings")
+print("==============================\n")
+
+start_time = time.time()
+
+manifest = build_postings(DB_PATH, out_dir, args.max_df)
+
+elapsed = time.time() - start_time
+
+postings = PostingIndex(out_dir)
+size_mb = sum(
+    os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir)
+) / (1024 * 1024)
+
+print("\n================================")
+print("✅ Posting lists successfully built!")
+print(f"Fingerprints: {len(postings)}")
+print(f"Books: {len(manifest['book_ids'])}")
+print(f"Size on disk: {size_mb:.1f} MB")
+print(f"Saved to: {out_dir}")
+print(f"Time taken: {round(elapsed, 2)} seconds")
+print("================================\n")
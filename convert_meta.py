@@ -0,0 +1,60 @@
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+from backend.api.meta_store import MetaStore, convert_legacy_meta
+
+META_PATH = "books_meta.npy"
+META_STORE_DIR = "books_meta"
+
+
+def timed_load(loader):
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = loader()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, elapsed, peak / (1024 * 1024)
+
+
+def load_legacy(meta_path):
+    # What image_search.py did at startup before the columnar store.
+    metadata = np.load(meta_path, allow_pickle=True)
+    book_to_indices = {}
+    for i, m in enumerate(metadata):
+        book_to_indices.setdefault(m["book"], []).append(i)
+    return metadata, book_to_indices
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert books_meta.npy into the columnar metadata store."
+    )
+    parser.add_argument("meta_path", nargs="?", default=META_PATH)
+    parser.add_argument("out_dir", nargs="?", default=META_STORE_DIR)
+    parser.add_argument("--compare", action="store_true", help="time both loaders afterwards")
+    args = parser.parse_args()
+
+    start = time.time()
+    rows, books = convert_legacy_meta(args.meta_path, args.out_dir)
+    print(f"Converted {rows:,} rows / {books:,} books into {args.out_dir} in {time.time() - start:.1f}s")
+
+    if not args.compare:
+        return
+
+    (metadata, book_to_indices), legacy_s, legacy_mb = timed_load(lambda: load_legacy(args.meta_path))
+    store, store_s, store_mb = timed_load(lambda: MetaStore(args.out_dir))
+
+    for book, rows in book_to_indices.items():
+        if store.rows_of_book(book).tolist() != rows:
+            raise SystemExit(f"Row mismatch for {book}")
+
+    print(f"\n{'loader':<10}{'load s':>10}{'peak MB':>10}")
+    print(f"{'legacy':<10}{legacy_s:>10.3f}{legacy_mb:>10.1f}")
+    print(f"{'columnar':<10}{store_s:>10.3f}{store_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import time
+import argparse
+
+from backend.api.encoders import QUANT_CONFIG, QUANT_CONFIGS, ensure_local, export_onnx
+
+MODELS = {
+    "minilm": ("all-MiniLM-L6-v2", "./models/minilm"),
+    "mpnet": ("sentence-transformers/all-mpnet-base-v2", "./models/mpnet"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the sentence encoders to ONNX (and int8) under ./models/*."
+    )
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument(
+        "--quantize", nargs="*", choices=QUANT_CONFIGS, default=[QUANT_CONFIG],
+        help="int8 targets to write (none: float32 ONNX only)",
+    )
+    args = parser.parse_args()
+
+    for key in args.models:
+        model_name, save_path = MODELS[key]
+
+        start = time.time()
+        ensure_local(model_name, save_path)
+        written = export_onnx(save_path, args.quantize)
+
+        print(f"{key}: {time.time() - start:.1f}s")
+        for path in written:
+            print(f"  {path}")
+
+    print("\nServe with LEAFLENS_ENCODER_BACKEND=onnx or onnx_int8 "
+          "(LEAFLENS_ONNX_QUANT selects the int8 file).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,43 @@
 import os
 import sqlite3
-import hashlib
 import re
+import time
+import argparse
+from itertools import repeat
+from multiprocessing import Pool
 
+from backend.api.doc_freq import build_doc_freq, prune_fingerprints
+from backend.api.fingerprint import (
+    LATEST_FINGERPRINT,
+    fingerprint_windows,
+    get_fingerprint_version,
+    get_winnow_k,
+    set_fingerprint_version,
+    set_winnow_k,
+)
+from backend.api.gutenberg import strip_gutenberg
+from backend.api.schema import SCHEMA_V2, ensure_schema, get_meta, int_hash_to_hex, set_meta
 
 BOOKS_DIR = "data/books"
 DB_PATH = "books.db"
 
-WINDOW_SIZES = [6, 7, 8]   
-STEP = 1
+WINDOW_SIZES = [6, 7, 8]
+
+# Fingerprint function for new databases. Existing ones keep the version
+# they were built with (MD5 if none is recorded).
+FINGERPRINT_VERSION = LATEST_FINGERPRINT
+
+# Drop the Project Gutenberg licence header/footer before fingerprinting.
+STRIP_GUTENBERG = True
+
+# Bulk (--workers > 1) mode
+BULK_COMMIT_ROWS = 5_000_000
+BULK_PRAGMAS = [
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-524288",  # 512 MB
+]
+STAGE_SUFFIX = ".stage"
 
 
 
@@ -19,83 +48,357 @@ def normalize_text(text):
     return text.strip()
 
 
-def fingerprint_text(text, window_size):
-    words = text.split()
-    for i in range(0, len(words) - window_size + 1, STEP):
-        window = " ".join(words[i:i + window_size])
-        h = hashlib.md5(window.encode("utf-8")).hexdigest()[:16]
-        yield h, i
+def fingerprint_text(text, version, winnow_k=1):
+    return fingerprint_windows(text.split(), WINDOW_SIZES, version, winnow_k)
 
 
+def fingerprint_book(job):
+    """
+    Worker side of bulk mode: read, normalize and fingerprint one file.
+    """
+    book_id, path, version, winnow_k = job
 
-# ---------------- DB SETUP ----------------
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS books (
-    book_id TEXT PRIMARY KEY,
-    title TEXT,
-    author TEXT
-)
-""")
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        raw_text = f.read()
 
-c.execute("""
-CREATE TABLE IF NOT EXISTS fingerprints (
-    hash TEXT,
-    book_id TEXT,
-    position INTEGER
-)
-""")
+    if STRIP_GUTENBERG:
+        raw_text = strip_gutenberg(raw_text)
+
+    hashes, positions = fingerprint_text(normalize_text(raw_text), version, winnow_k)
+    return book_id, hashes, positions
 
-c.execute("""
-CREATE INDEX IF NOT EXISTS idx_fingerprint_hash
-ON fingerprints(hash)
-""")
 
-conn.commit()
+# ---------------- DB SETUP ----------------
+def open_db(db_path, winnow_k=None):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
 
+    # New databases get the compact v2 layout; existing ones keep theirs until
+    # migrated with migrate_fingerprints.py.
+    schema_version = ensure_schema(conn)
 
-files = [f for f in os.listdir(BOOKS_DIR) if f.endswith(".txt")]
+    if schema_version != SCHEMA_V2:
+        # A bulk load killed outright can leave v1 without its hash index.
+        c.execute("CREATE INDEX IF NOT EXISTS idx_fingerprint_hash ON fingerprints(hash)")
+        conn.commit()
 
-for filename in files:
-    book_id = filename.replace(".txt", "")
-    path = os.path.join(BOOKS_DIR, filename)
+    is_empty = c.execute("SELECT 1 FROM fingerprints LIMIT 1").fetchone() is None
+    if is_empty and get_meta(conn, "fingerprint_version") is None:
+        set_fingerprint_version(conn, FINGERPRINT_VERSION)
+        conn.commit()
 
-    exists = c.execute(
-        "SELECT 1 FROM fingerprints WHERE book_id=? LIMIT 1",
-        (book_id,)
-    ).fetchone()
+    # Winnowing is fixed when the first book goes in; queries read it back.
+    if winnow_k is not None:
+        if is_empty:
+            set_winnow_k(conn, winnow_k)
+            conn.commit()
+        elif winnow_k != get_winnow_k(conn):
+            raise SystemExit(
+                f"{db_path} was built with winnow k={get_winnow_k(conn)}; "
+                f"cannot add books with k={winnow_k}"
+            )
 
-    if exists:
-        print(f" Skipping already indexed: {book_id}")
-        continue
+    fp_version = get_fingerprint_version(conn)
+    winnow_k = get_winnow_k(conn)
+    print(
+        f"Fingerprint schema: v{schema_version}, "
+        f"fingerprint version: {fp_version}, winnow k: {winnow_k}"
+    )
 
-    print(f"\n📘 Indexing (Shazam-style): {book_id}")
+    return conn, schema_version, (fp_version, winnow_k)
 
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        raw_text = f.read()
 
-    text = normalize_text(raw_text)
+def is_indexed(c, book_id, schema_version):
+    if schema_version == SCHEMA_V2:
+        row = c.execute(
+            "SELECT 1 FROM books WHERE book_id=? AND indexed=1",
+            (book_id,)
+        ).fetchone()
+    else:
+        row = c.execute(
+            "SELECT 1 FROM fingerprints WHERE book_id=? LIMIT 1",
+            (book_id,)
+        ).fetchone()
+
+    return row is not None
 
+
+def add_book(c, book_id, schema_version):
+    """
+    Insert the `books` row and return the key fingerprints reference.
+    """
     c.execute(
         "INSERT OR IGNORE INTO books (book_id, title, author) VALUES (?, ?, ?)",
         (book_id, book_id.replace("_", " ").title(), "Unknown")
     )
 
-    inserts = []
+    if schema_version == SCHEMA_V2:
+        return c.execute(
+            "SELECT book_key FROM books WHERE book_id=?", (book_id,)
+        ).fetchone()[0]
+
+    return book_id
+
 
-    for w in WINDOW_SIZES:
-        for h, pos in fingerprint_text(text, w):
-            inserts.append((h, book_id, pos))
+def fingerprint_rows(book_key, hashes, positions, schema_version):
+    if schema_version == SCHEMA_V2:
+        return zip(hashes.tolist(), repeat(book_key), positions.tolist())
 
-    c.executemany(
-        "INSERT INTO fingerprints (hash, book_id, position) VALUES (?, ?, ?)",
-        inserts
+    return (
+        (int_hash_to_hex(h), book_key, pos)
+        for h, pos in zip(hashes.tolist(), positions.tolist())
     )
 
+
+def pending_books(c, schema_version):
+    files = [f for f in os.listdir(BOOKS_DIR) if f.endswith(".txt")]
+    pending = []
+
+    for filename in files:
+        book_id = filename.replace(".txt", "")
+
+        if is_indexed(c, book_id, schema_version):
+            print(f" Skipping already indexed: {book_id}")
+            continue
+
+        pending.append((book_id, os.path.join(BOOKS_DIR, filename)))
+
+    return pending
+
+
+# ---------------- SERIAL ----------------
+def index_serial(conn, schema_version, fp_settings):
+    c = conn.cursor()
+
+    for book_id, path in pending_books(c, schema_version):
+        print(f"\n📘 Indexing (Shazam-style): {book_id}")
+
+        _, hashes, positions = fingerprint_book((book_id, path, *fp_settings))
+
+        book_key = add_book(c, book_id, schema_version)
+        rows = fingerprint_rows(book_key, hashes, positions, schema_version)
+
+        if schema_version == SCHEMA_V2:
+            c.executemany(
+                "INSERT OR IGNORE INTO fingerprints (hash, book_key, position) VALUES (?, ?, ?)",
+                rows
+            )
+            c.execute("UPDATE books SET indexed=1 WHERE book_key=?", (book_key,))
+        else:
+            c.executemany(
+                "INSERT INTO fingerprints (hash, book_id, position) VALUES (?, ?, ?)",
+                rows
+            )
+
+        conn.commit()
+        print(f"Stored {len(hashes)} fingerprints")
+
+
+# ---------------- BULK ----------------
+def attach_stage(conn):
+    """
+    Attach a fresh staging database beside the main one as `stage`.
+    Returns its path.
+    """
+    main_path = next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+    stage_path = main_path + STAGE_SUFFIX
+
+    # Left behind by an interrupted run (or, in main, by older versions).
+    conn.execute("DROP TABLE IF EXISTS main.fingerprints_stage")
     conn.commit()
-    print(f"Stored {len(inserts)} fingerprints")
+    if os.path.exists(stage_path):
+        os.remove(stage_path)
+
+    conn.execute("ATTACH DATABASE ? AS stage", (stage_path,))
+    conn.execute("PRAGMA stage.journal_mode=OFF")
+
+    return stage_path
+
+
+def detach_stage(conn, stage_path):
+    conn.execute("DETACH DATABASE stage")
+    os.remove(stage_path)
+
+
+def index_parallel(conn, schema_version, fp_settings, workers):
+    """
+    Workers normalize and fingerprint; this process is the only writer.
+    Inserts go into an unindexed table in large transactions and the hash
+    index is built once at the end.
+    """
+    c = conn.cursor()
+
+    for pragma in BULK_PRAGMAS:
+        c.execute(pragma)
+
+    if schema_version == SCHEMA_V2:
+        # The clustered primary key cannot be dropped, so load into a plain
+        # staging table and merge it in key order afterwards. The stage is
+        # a separate database file, so its pages never end up as free
+        # space in books.db.
+        stage_path = attach_stage(conn)
+        c.execute("""
+            CREATE TABLE stage.fingerprints_stage (
+                hash INTEGER,
+                book_key INTEGER,
+                position INTEGER
+            )
+        """)
+        insert_sql = "INSERT INTO stage.fingerprints_stage (hash, book_key, position) VALUES (?, ?, ?)"
+    else:
+        c.execute("DROP INDEX IF EXISTS idx_fingerprint_hash")
+        insert_sql = "INSERT INTO fingerprints (hash, book_id, position) VALUES (?, ?, ?)"
+
+    conn.commit()
+
+    jobs = [
+        (book_id, path, *fp_settings)
+        for book_id, path in pending_books(c, schema_version)
+    ]
+
+    print(f"\nIndexing {len(jobs)} books with {workers} workers...")
+
+    start = time.time()
+    books_done = 0
+    total_fps = 0
+    uncommitted = 0
+    loaded_keys = []
+
+    try:
+        with Pool(workers) as pool:
+            for book_id, hashes, positions in pool.imap_unordered(fingerprint_book, jobs):
+                book_key = add_book(c, book_id, schema_version)
+                c.executemany(
+                    insert_sql,
+                    fingerprint_rows(book_key, hashes, positions, schema_version)
+                )
+
+                loaded_keys.append(book_key)
+                books_done += 1
+                total_fps += len(hashes)
+                uncommitted += len(hashes)
+
+                if uncommitted >= BULK_COMMIT_ROWS:
+                    conn.commit()
+                    uncommitted = 0
+
+                if books_done % 50 == 0:
+                    elapsed = time.time() - start
+                    print(
+                        f"  {books_done}/{len(jobs)} books | "
+                        f"{books_done / elapsed:.1f} books/s | "
+                        f"{total_fps / elapsed:,.0f} fingerprints/s"
+                    )
+
+        conn.commit()
+    except BaseException:
+        if schema_version == SCHEMA_V2:
+            conn.rollback()
+            detach_stage(conn, stage_path)
+        else:
+            # Committed batches hold whole books only; drop the partial one
+            # and put the hash index back so searches don't fall back to
+            # full table scans. The remaining books load on the next run.
+            conn.rollback()
+            print("Interrupted, rebuilding hash index...")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_fingerprint_hash ON fingerprints(hash)")
+            conn.commit()
+        raise
+    load_elapsed = time.time() - start
+
+    print("Building hash index...")
+    index_start = time.time()
+
+    if schema_version == SCHEMA_V2:
+        c.execute("""
+            INSERT OR IGNORE INTO fingerprints (hash, book_key, position)
+            SELECT hash, book_key, position FROM stage.fingerprints_stage
+            ORDER BY 1, 2, 3
+        """)
+        c.executemany(
+            "UPDATE books SET indexed=1 WHERE book_key=?",
+            ((key,) for key in loaded_keys)
+        )
+        conn.commit()
+        detach_stage(conn, stage_path)
+    else:
+        c.execute("CREATE INDEX IF NOT EXISTS idx_fingerprint_hash ON fingerprints(hash)")
+
+    conn.commit()
+
+    index_elapsed = time.time() - index_start
+    total_elapsed = time.time() - start
+
+    print("\n================================")
+    print(f"Books indexed: {books_done}")
+    print(f"Fingerprints: {total_fps}")
+    print(
+        f"Load: {load_elapsed:.1f}s | "
+        f"{books_done / max(load_elapsed, 1e-9):.1f} books/s | "
+        f"{total_fps / max(load_elapsed, 1e-9):,.0f} fingerprints/s"
+    )
+    print(f"Index build: {index_elapsed:.1f}s")
+    print(
+        f"Overall: {total_elapsed:.1f}s | "
+        f"{books_done / max(total_elapsed, 1e-9):.1f} books/s | "
+        f"{total_fps / max(total_elapsed, 1e-9):,.0f} fingerprints/s"
+    )
+    print("================================")
+
+
+# ---------------- DOC FREQUENCY ----------------
+def update_doc_freq(conn, max_df=None):
+    start = time.time()
+    shared = build_doc_freq(conn)
+    print(f"\nDocument frequencies: {shared} hashes shared by 2+ books ({time.time() - start:.1f}s)")
+
+    if max_df is None:
+        return
+
+    stop = conn.execute(
+        "SELECT COUNT(*) FROM fingerprint_df WHERE df > ?", (max_df,)
+    ).fetchone()[0]
+    removed = prune_fingerprints(conn, max_df)
+
+    set_meta(conn, "pruned_max_df", max_df)
+    conn.commit()
+
+    print(f"Pruned {removed} fingerprints for {stop} hashes in more than {max_df} books")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint books into books.db.")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="worker processes; more than 1 enables bulk ingestion mode",
+    )
+    parser.add_argument(
+        "--winnow", type=int, default=None, metavar="K",
+        help="keep only the minimum hash of every K windows (new databases only)",
+    )
+    parser.add_argument(
+        "--doc-freq", action="store_true",
+        help="rebuild the per-hash document-frequency table after indexing",
+    )
+    parser.add_argument(
+        "--prune-df", type=int, default=None, metavar="N",
+        help="delete fingerprints whose hash occurs in more than N books (implies --doc-freq)",
+    )
+    args = parser.parse_args()
+
+    conn, schema_version, fp_settings = open_db(DB_PATH, args.winnow)
+
+    if args.workers > 1:
+        index_parallel(conn, schema_version, fp_settings, args.workers)
+    else:
+        index_serial(conn, schema_version, fp_settings)
+
+    if args.doc_freq or args.prune_df is not None:
+        update_doc_freq(conn, args.prune_df)
+
+    conn.close()
+    print("\n Shazam-style indexing complete.")
+
 
-conn.close()
-print("\n Shazam-style indexing complete.")
+if __name__ == "__main__":
+    main()
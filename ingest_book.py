@@ -0,0 +1,278 @@
+import os
+import time
+import shutil
+import sqlite3
+import argparse
+import faiss
+import numpy as np
+
+from backend.api.ann import compact_ids, remove_ids, stored_ids, with_ids
+from backend.api.embedding_store import (
+    append_npy, append_store, open_store, replace_store, take_npy, take_store,
+)
+from backend.api.encoders import backend_for, ensure_local, load_encoder
+from backend.api.meta_store import MetaStore, append_meta_rows, compact_meta_store, remove_books
+from backend.api.postings import remove_posting_books
+from backend.api.schema import SCHEMA_V2, get_schema_version
+
+DB_PATH = "books.db"
+POSTINGS_DIR = "books_postings"
+INDEX_PATH = "books.index"
+META_STORE_DIR = "books_meta"
+MPNET_EMB_PATH = "mpnet_embeddings.npy"
+MPNET_STORE_PATH = "mpnet_store.npy"
+MINILM_DIR = "./models/minilm"
+MPNET_DIR = "./models/mpnet"
+
+# Same chunking as ocr_search.build_index
+CHUNK_SIZE = 800
+PREVIEW_CHARS = 250
+
+
+def chunk_book(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    chunks = [text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
+    return chunks, [chunk[:PREVIEW_CHARS] for chunk in chunks]
+
+
+def load_index():
+    # The first incremental change wraps the index in an IndexIDMap2 whose
+    # ids are metadata rows.
+    return with_ids(faiss.read_index(INDEX_PATH))
+
+
+def save_index(index, path=INDEX_PATH):
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def compact_path(path):
+    root, ext = os.path.splitext(path)
+    return root + ".compact" + ext
+
+
+def check_in_sync(meta, index):
+    """
+    Refuse to touch anything unless the index, MPNet store and metadata
+    describe the same rows.
+    """
+    rows = len(meta)
+    problems = []
+
+    store_rows = open_store(MPNET_STORE_PATH).shape[0]
+    if store_rows != rows:
+        problems.append(f"{MPNET_STORE_PATH} has {store_rows}")
+
+    if os.path.exists(MPNET_EMB_PATH):
+        emb_rows = np.load(MPNET_EMB_PATH, mmap_mode="r").shape[0]
+        if emb_rows != rows:
+            problems.append(f"{MPNET_EMB_PATH} has {emb_rows}")
+
+    ids = stored_ids(index)
+    if len(ids) and ids.max() >= rows:
+        problems.append(f"{INDEX_PATH} has ids up to {ids.max()}")
+
+    # Every live row needs its vector; removed rows may linger (HNSW keeps
+    # them until compact), so ntotal sits between the two counts.
+    live = np.flatnonzero(~meta.removed_rows())
+    missing = np.setdiff1d(live, ids)
+    if len(missing) or not len(live) <= index.ntotal <= rows:
+        problems.append(
+            f"{INDEX_PATH} has {index.ntotal} vectors for {len(live)} live rows"
+            + (f", missing rows from {missing[0]}" if len(missing) else "")
+        )
+
+    if problems:
+        raise SystemExit(
+            f"{META_STORE_DIR} has {rows} rows but {', '.join(problems)}. "
+            "Rebuild with ocr_search.py and build_mpnet.py."
+        )
+
+
+def prune_fingerprints(names):
+    """
+    Delete the books' fingerprints from books.db and tombstone them in the
+    posting lists, so /text-search and the image cascade stop matching
+    them. Their `books` rows stay for a later re-index.
+    """
+    if not os.path.exists(DB_PATH):
+        return
+
+    # index_books.py names books after their file
+    book_ids = [name.replace(".txt", "") for name in names]
+    marks = ",".join("?" * len(book_ids))
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        if get_schema_version(conn) == SCHEMA_V2:
+            deleted = conn.execute(
+                f"DELETE FROM fingerprints WHERE book_key IN "
+                f"(SELECT book_key FROM books WHERE book_id IN ({marks}))",
+                book_ids,
+            ).rowcount
+            conn.execute(f"UPDATE books SET indexed = 0 WHERE book_id IN ({marks})", book_ids)
+        else:
+            deleted = conn.execute(
+                f"DELETE FROM fingerprints WHERE book_id IN ({marks})", book_ids
+            ).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"Deleted {deleted} fingerprints from {DB_PATH}")
+
+    if os.path.isdir(POSTINGS_DIR):
+        found = remove_posting_books(POSTINGS_DIR, book_ids)
+        print(f"Tombstoned {found} books in {POSTINGS_DIR} (build_postings.py drops them)")
+
+
+def tombstone(index, names):
+    rows = remove_books(META_STORE_DIR, names)
+    removed = remove_ids(index, rows)
+
+    if removed is None:
+        print(f"Tombstoned {len(rows)} rows (HNSW keeps them until compact)")
+    else:
+        print(f"Removed {removed} rows")
+
+
+def add(paths, replace):
+    start = time.time()
+
+    meta = MetaStore(META_STORE_DIR)
+    index = load_index()
+    check_in_sync(meta, index)
+
+    names = [os.path.basename(path) for path in paths]
+    present = [name for name in names if len(meta.rows_of_book(name))]
+    if present and not replace:
+        raise SystemExit(f"Already indexed: {', '.join(present)} (use --replace)")
+
+    books, chunks, previews = [], [], []
+    for path, name in zip(paths, names):
+        book_chunks, book_previews = chunk_book(path)
+        books += [name] * len(book_chunks)
+        chunks += book_chunks
+        previews += book_previews
+
+    print(f"Encoding {len(chunks)} chunks of {len(paths)} books...")
+
+    ensure_local("all-MiniLM-L6-v2", MINILM_DIR)
+    ensure_local("sentence-transformers/all-mpnet-base-v2", MPNET_DIR)
+    minilm = load_encoder(MINILM_DIR, backend_for("minilm"))
+    mpnet = load_encoder(MPNET_DIR, backend_for("mpnet"))
+
+    mini_emb = minilm.encode(chunks, batch_size=32).astype("float32")
+    faiss.normalize_L2(mini_emb)
+    mpnet_emb = mpnet.encode(previews, batch_size=32).astype("float32")
+
+    if present:
+        tombstone(index, present)
+
+    first_row = len(meta)
+    ids = np.arange(first_row, first_row + len(chunks), dtype=np.int64)
+
+    # Metadata last: until it grows, the new rows aren't referenced.
+    append_store(MPNET_STORE_PATH, mpnet_emb)
+    if os.path.exists(MPNET_EMB_PATH):
+        append_npy(MPNET_EMB_PATH, mpnet_emb)
+
+    index.add_with_ids(mini_emb, ids)
+    save_index(index)
+
+    append_meta_rows(META_STORE_DIR, books, previews)
+
+    print(f"Added rows {first_row}-{first_row + len(chunks) - 1} in {time.time() - start:.1f}s")
+
+
+def remove(names):
+    meta = MetaStore(META_STORE_DIR)
+    index = load_index()
+    check_in_sync(meta, index)
+
+    unknown = [name for name in names if not len(meta.rows_of_book(name))]
+    if unknown:
+        raise SystemExit(f"Not in the index: {', '.join(unknown)}")
+
+    # Fingerprints first: if this stops halfway, running it again finishes.
+    prune_fingerprints(names)
+
+    tombstone(index, names)
+    save_index(index)
+
+
+def compact():
+    start = time.time()
+
+    meta = MetaStore(META_STORE_DIR)
+    index = load_index()
+    check_in_sync(meta, index)
+
+    dead = int(meta.removed_rows().sum())
+    if not dead:
+        print("Nothing to compact")
+        return
+
+    # Everything is written beside the live files and swapped in at the end,
+    # metadata last. A crash before the swap leaves the old files untouched;
+    # check_in_sync refuses a half-swapped set.
+    new_meta = compact_path(META_STORE_DIR)
+    shutil.rmtree(new_meta, ignore_errors=True)
+
+    new_rows = compact_meta_store(META_STORE_DIR, new_meta)
+    kept = np.flatnonzero(new_rows >= 0)
+
+    take_store(MPNET_STORE_PATH, kept, compact_path(MPNET_STORE_PATH))
+    if os.path.exists(MPNET_EMB_PATH):
+        take_npy(MPNET_EMB_PATH, kept, compact_path(MPNET_EMB_PATH))
+
+    save_index(compact_ids(index, new_rows), compact_path(INDEX_PATH))
+
+    os.replace(compact_path(INDEX_PATH), INDEX_PATH)
+    replace_store(compact_path(MPNET_STORE_PATH), MPNET_STORE_PATH)
+    if os.path.exists(MPNET_EMB_PATH):
+        os.replace(compact_path(MPNET_EMB_PATH), MPNET_EMB_PATH)
+
+    old_meta = META_STORE_DIR + ".old"
+    shutil.rmtree(old_meta, ignore_errors=True)
+    os.replace(META_STORE_DIR, old_meta)
+    os.replace(new_meta, META_STORE_DIR)
+    shutil.rmtree(old_meta)
+
+    print(f"Dropped {dead} rows, {len(kept)} left ({time.time() - start:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add or remove books in the FAISS index, metadata and MPNet store without a rebuild."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="encode and append books (.txt files)")
+    add_parser.add_argument("paths", nargs="+")
+    add_parser.add_argument("--replace", action="store_true", help="re-ingest books already indexed")
+
+    remove_parser = commands.add_parser(
+        "remove", help="tombstone books by filename and delete their fingerprints"
+    )
+    remove_parser.add_argument("names", nargs="+")
+
+    commands.add_parser("compact", help="drop removed rows for good")
+
+    args = parser.parse_args()
+
+    if args.command == "add":
+        add(args.paths, args.replace)
+    elif args.command == "remove":
+        remove(args.names)
+    else:
+        compact()
+
+    print("Restart the API workers to serve the change.")
+
+
+if __name__ == "__main__":
+    main()
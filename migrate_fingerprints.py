@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+
+from backend.api.schema import (
+    SCHEMA_V1,
+    SCHEMA_V2,
+    get_schema_version,
+    hex_hash_to_int,
+    migrate_v1_to_v2,
+)
+
+DB_PATH = "books.db"
+PROBE_COUNT = 2000
+
+
+def db_size_mb(path):
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def sample_hashes(conn, n):
+    total = conn.execute("SELECT MAX(rowid) FROM fingerprints").fetchone()[0] or 0
+    rowids = random.sample(range(1, total + 1), min(n, total))
+
+    return [
+        row[0]
+        for rid in rowids
+        for row in conn.execute("SELECT hash FROM fingerprints WHERE rowid=?", (rid,))
+    ]
+
+
+def probe_latency(conn, sql, hashes):
+    c = conn.cursor()
+    start = time.perf_counter()
+    for h in hashes:
+        c.execute(sql, (h,)).fetchall()
+    return (time.perf_counter() - start) / max(len(hashes), 1) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migrate books.db fingerprints to the compact v2 schema in place."
+    )
+    parser.add_argument("db", nargs="?", default=DB_PATH)
+    parser.add_argument("--backup", action="store_true", help="copy the v1 file to <db>.v1.bak first")
+    parser.add_argument("--probes", type=int, default=PROBE_COUNT)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise FileNotFoundError(f"{args.db} not found.")
+
+    conn = sqlite3.connect(args.db)
+
+    version = get_schema_version(conn)
+    if version == SCHEMA_V2:
+        print("Already on schema v2, nothing to do.")
+        return
+
+    if version != SCHEMA_V1:
+        sys.exit(f"Unknown schema version: {version}")
+
+    if args.backup:
+        conn.close()
+        shutil.copyfile(args.db, args.db + ".v1.bak")
+        print(f"Backup written to {args.db}.v1.bak")
+        conn = sqlite3.connect(args.db)
+
+    print("\n==============================")
+    print("Migrating Fingerprints to v2")
+    print("==============================\n")
+
+    rows = conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+    probes = sample_hashes(conn, args.probes)
+
+    size_before = db_size_mb(args.db)
+    latency_before = probe_latency(
+        conn, "SELECT book_id, position FROM fingerprints WHERE hash=?", probes
+    )
+
+    start_time = time.time()
+    migrate_v1_to_v2(conn)
+    elapsed = time.time() - start_time
+
+    size_after = db_size_mb(args.db)
+    latency_after = probe_latency(
+        conn,
+        "SELECT b.book_id, f.position FROM fingerprints f "
+        "JOIN books b ON b.book_key = f.book_key WHERE f.hash=?",
+        [hex_hash_to_int(h) for h in probes],
+    )
+
+    conn.close()
+
+    print("\n================================")
+    print("✅ Migration complete!")
+    print(f"Fingerprints: {rows}")
+    print(f"Time taken: {round(elapsed, 2)} seconds")
+    print("")
+    print(f"{'':<16}{'v1':>12}{'v2':>12}")
+    print(f"{'Size (MB)':<16}{size_before:>12.1f}{size_after:>12.1f}")
+    print(f"{'Probe (us)':<16}{latency_before:>12.1f}{latency_after:>12.1f}")
+    print(f"({len(probes)} random hash probes, warm cache)")
+    print("================================\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,15 @@ import cv2
 from sentence_transformers import SentenceTransformer
 from collections import Counter
 
+from backend.api.embedding_cache import embedding_cache
+from backend.api.meta_store import write_meta_store
+
 
 # PATHS
 BOOKS_DIR = "data/books"
 INDEX_PATH = "books.index"
 META_PATH = "books_meta.npy"
+META_STORE_DIR = "books_meta"
 MPNET_EMB_PATH = "mpnet_embeddings.npy"
 DB_PATH = "books.db"
 
@@ -98,6 +102,11 @@ def build_index():
 
     faiss.write_index(index, INDEX_PATH)
     np.save(META_PATH, metadata)
+    write_meta_store(
+        [m["book"] for m in metadata],
+        [m["preview"] for m in metadata],
+        META_STORE_DIR,
+    )
 
     print("MiniLM index built successfully!")
 
@@ -177,9 +186,10 @@ def chunk_text(text):
 # FAST RETRIEVAL (MiniLM)
 def fast_search(chunks):
 
-    emb = miniLM.encode(
+    emb = embedding_cache.encode(
+        "minilm",
         chunks,
-        batch_size=32
+        lambda texts: miniLM.encode(texts, batch_size=32)
     ).astype("float32")
 
     faiss.normalize_L2(emb)
@@ -200,9 +210,10 @@ def rerank_candidates(chunks, candidate_books):
     vote_counter = Counter(candidate_books)
     top_books = [b for b, _ in vote_counter.most_common(MAX_RERANK_BOOKS)]
 
-    emb_query = mpnet.encode(
+    emb_query = embedding_cache.encode(
+        "mpnet",
         chunks,
-        batch_size=16
+        lambda texts: mpnet.encode(texts, batch_size=16)
     ).astype("float32")
 
     emb_query /= np.linalg.norm(emb_query, axis=1, keepdims=True)
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import numpy as np
+
+from backend.api.embedding_store import WRITE_ROWS, append_npy
+
+
+def write_unpadded_npy(path, arr):
+    """
+    A .npy whose header has no room to grow, as older numpy wrote them
+    (16-byte alignment, minimal padding).
+    """
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+        np.lib.format.dtype_to_descr(arr.dtype), arr.shape
+    )
+    pad = -(10 + len(header) + 1) % 16
+    header = (header + " " * pad + "\n").encode("latin1")
+
+    with open(path, "wb") as f:
+        f.write(np.lib.format.magic(1, 0))
+        f.write(len(header).to_bytes(2, "little"))
+        f.write(header)
+        f.write(arr.tobytes())
+
+
+def check_append(old_rows):
+    rng = np.random.default_rng(old_rows)
+    old = rng.standard_normal((old_rows, 8)).astype(np.float16)
+    new = rng.standard_normal((5, 8)).astype(np.float16)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "emb.npy")
+        write_unpadded_npy(path, old)
+        assert np.array_equal(np.load(path), old)
+
+        assert append_npy(path, new) == old_rows + 5
+
+        merged = np.load(path)
+        assert merged.shape == (old_rows + 5, 8)
+        assert np.array_equal(merged, np.concatenate([old, new]))
+        assert os.listdir(tmp) == ["emb.npy"]
+
+
+def test_append_without_header_padding():
+    check_append(3)
+
+
+def test_append_without_header_padding_many_chunks():
+    # Crosses WRITE_ROWS, so the last copied chunk is a partial one.
+    check_append(WRITE_ROWS + 7)
+
+
+if __name__ == "__main__":
+    test_append_without_header_padding()
+    test_append_without_header_padding_many_chunks()
+    print("append_npy fallback OK")
@@ -0,0 +1,151 @@
+import os
+import time
+import random
+import argparse
+import numpy as np
+
+from backend.api.fingerprint import LATEST_FINGERPRINT, fingerprint_windows
+from backend.api.postings import lookup_sorted
+from index_books import BOOKS_DIR, WINDOW_SIZES, normalize_text
+
+# Mirrors the thresholds in backend/api/text_search.py for short queries.
+BASE_MIN_ALIGNED = 8
+MIN_DOMINANCE = 0.45
+MIN_TOTAL_VOTES = 12
+
+# hash (int64) + book (int32) + position (int32) in the compiled postings
+POSTING_BYTES = 16
+
+
+def load_corpus(max_books):
+    files = sorted(f for f in os.listdir(BOOKS_DIR) if f.endswith(".txt"))
+    if max_books:
+        files = files[:max_books]
+
+    corpus = []
+    for filename in files:
+        with open(os.path.join(BOOKS_DIR, filename), "r", encoding="utf-8", errors="ignore") as f:
+            corpus.append(normalize_text(f.read()).split())
+
+    return files, corpus
+
+
+def build_index(corpus, k):
+    hashes, books, positions = [], [], []
+
+    for book, words in enumerate(corpus):
+        h, p = fingerprint_windows(words, WINDOW_SIZES, LATEST_FINGERPRINT, k)
+        hashes.append(h)
+        books.append(np.full(len(h), book, dtype=np.int32))
+        positions.append(p.astype(np.int32))
+
+    hashes = np.concatenate(hashes)
+    order = np.argsort(hashes, kind="stable")
+
+    return hashes[order], np.concatenate(books)[order], np.concatenate(positions)[order]
+
+
+def identify(index, words, k, n_books):
+    """
+    Best (book, aligned, votes, dominance) under the same offset voting as
+    run_text_search (None if nothing matched), plus the query's fingerprint
+    count.
+    """
+    q_hashes, q_positions = fingerprint_windows(words, WINDOW_SIZES, LATEST_FINGERPRINT, k)
+    q_idx, books, positions = lookup_sorted(*index, q_hashes)
+
+    if len(books) == 0:
+        return None, len(q_hashes)
+
+    offsets = positions.astype(np.int64) - q_positions[q_idx]
+    votes = np.bincount(books, minlength=n_books)
+
+    pairs, pair_counts = np.unique(
+        np.stack([books.astype(np.int64), offsets]), axis=1, return_counts=True
+    )
+
+    aligned = np.zeros(n_books, dtype=np.int64)
+    np.maximum.at(aligned, pairs[0], pair_counts)
+
+    best = int(np.lexsort((votes, aligned))[-1])
+    return (best, int(aligned[best]), int(votes[best]), aligned[best] / votes[best]), len(q_hashes)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index size and match recall of winnowed fingerprints vs the dense index."
+    )
+    parser.add_argument("--ks", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=40)
+    parser.add_argument("--max-books", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    files, corpus = load_corpus(args.max_books)
+    print(f"Corpus: {len(files)} books, {sum(map(len, corpus)):,} words")
+
+    rng = random.Random(args.seed)
+    eligible = [b for b, words in enumerate(corpus) if len(words) > args.query_words]
+    samples = []
+    for _ in range(args.samples):
+        b = rng.choice(eligible)
+        start = rng.randrange(len(corpus[b]) - args.query_words)
+        samples.append((b, start))
+
+    print(
+        f"\n{'k':>4}{'rows':>14}{'size':>8}{'MB':>10}"
+        f"{'q fps':>8}{'recall':>9}{'build s':>9}{'query ms':>10}"
+    )
+
+    dense_rows = None
+
+    for k in [1] + [k for k in args.ks if k > 1]:
+        start = time.time()
+        index = build_index(corpus, k)
+        build_elapsed = time.time() - start
+
+        rows = len(index[0])
+        dense_rows = dense_rows or rows
+
+        density = 2 / (k + 1) if k > 1 else 1
+        min_aligned = max(3, round(BASE_MIN_ALIGNED * density))
+        min_votes = max(3, round(MIN_TOTAL_VOTES * density))
+
+        hits = 0
+        fanout = 0
+        start = time.time()
+
+        for b, pos in samples:
+            words = corpus[b][pos:pos + args.query_words]
+            best, n_fps = identify(index, words, k, len(corpus))
+            fanout += n_fps
+
+            if best is None:
+                continue
+
+            book, aligned, votes, dominance = best
+            if (
+                book == b
+                and aligned >= min_aligned
+                and votes >= min_votes
+                and dominance >= MIN_DOMINANCE
+            ):
+                hits += 1
+
+        query_ms = (time.time() - start) / len(samples) * 1000
+
+        print(
+            f"{'dense' if k == 1 else k:>4}"
+            f"{rows:>14,}"
+            f"{rows / dense_rows:>8.2f}"
+            f"{rows * POSTING_BYTES / (1024 * 1024):>10.1f}"
+            f"{fanout / len(samples):>8.1f}"
+            f"{hits / len(samples):>9.3f}"
+            f"{build_elapsed:>9.1f}"
+            f"{query_ms:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()